@@ -80,7 +80,7 @@ if os.environ.get("DATABASE_URL"):
     DATABASES = {
         "default": dj_database_url.config(
             default=os.environ["DATABASE_URL"],
-            conn_max_age=600,
+            conn_max_age=int(os.environ.get("CONN_MAX_AGE", "600")),
             ssl_require=True,
         )
     }
@@ -93,6 +93,18 @@ else:
     }
 
 
+# Cache
+# Set REDIS_URL to share cached responses and invalidations between the web and worker processes
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,3 +1,24 @@
 from django.contrib import admin
+from .models import BlockCheckpoint, ImageJob, InferenceResult
 
 # Register your models here.
+@admin.register(BlockCheckpoint)
+class BlockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'block_number', 'log_index', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('image_url', 'user', 'stage', 'status', 'attempts', 'lease_owner', 'updated_at')
+    list_filter = ('status', 'stage')
+    search_fields = ('image_url', 'tx_hash', 'user', 'result_tx_hash')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(InferenceResult)
+class InferenceResultAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'model_version', 'label', 'hits', 'last_used_at')
+    list_filter = ('model_version', 'label')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at',)
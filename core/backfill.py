@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = int(os.getenv('BACKFILL_CHUNK_SIZE', '2000'))
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', '4'))
+
+
+async def _get_logs(w3, semaphore, address, topics, from_block, to_block):
+    """Fetch one range, splitting it in half when the provider refuses it"""
+    try:
+        async with semaphore:
+            return await w3.eth.get_logs({
+                "address": address,
+                "topics": topics,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+            })
+    except Exception as e:
+        if from_block >= to_block:
+            raise
+        middle = (from_block + to_block) // 2
+        logger.warning(f"eth_getLogs {from_block}-{to_block} failed ({e}), splitting range")
+        first, second = await asyncio.gather(
+            _get_logs(w3, semaphore, address, topics, from_block, middle),
+            _get_logs(w3, semaphore, address, topics, middle + 1, to_block),
+        )
+        return list(first) + list(second)
+
+
+async def backfill(w3, address, topics, from_block, to_block, handler,
+                   chunk_size=BACKFILL_CHUNK_SIZE, concurrency=BACKFILL_CONCURRENCY):
+    """Replay logs in [from_block, to_block] through handler, fetching chunks concurrently.
+
+    The handler receives all logs as one batch, in chain order, once every chunk has arrived.
+    """
+    if from_block is None or from_block > to_block:
+        return 0
+    logger.info(f"Backfilling blocks {from_block}-{to_block} ({to_block - from_block + 1} blocks)")
+    semaphore = asyncio.Semaphore(concurrency)
+    chunks = await asyncio.gather(*(
+        _get_logs(w3, semaphore, address, topics, start, min(start + chunk_size - 1, to_block))
+        for start in range(from_block, to_block + 1, chunk_size)
+    ))
+    logs = sorted(
+        (log for chunk in chunks for log in chunk),
+        key=lambda log: (log["blockNumber"], log["logIndex"]),
+    )
+    if logs:
+        await handler(logs)
+    logger.info(f"Backfill complete: {len(logs)} logs from blocks {from_block}-{to_block}")
+    return len(logs)
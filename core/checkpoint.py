@@ -0,0 +1,114 @@
+import asyncio
+import heapq
+import logging
+from .models import BlockCheckpoint
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Log index recorded when a whole block range was scanned, so every log in the block counts as seen
+SCANNED_LOG_INDEX = 2 ** 31 - 1
+
+
+class CheckpointTracker:
+    """Tracks in-flight event positions and persists the last fully processed (block, log index).
+
+    Workers finish out of order, so the checkpoint only moves past a position
+    once every earlier position has finished as well.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.position = None
+        # position -> number of unfinished tasks
+        self._pending = {}
+        # finished positions still waiting on an earlier one
+        self._finished = []
+        # highest (block, SCANNED_LOG_INDEX) whose logs have all been handed to begin()
+        self._scanned = None
+        self._save_task = None
+        self._dirty = False
+
+    async def load(self):
+        checkpoint = await BlockCheckpoint.objects.filter(name=self.name).afirst()
+        if checkpoint is not None:
+            self.position = (checkpoint.block_number, checkpoint.log_index)
+            logger.info(f"Loaded checkpoint {self.name} at block {checkpoint.block_number}, log {checkpoint.log_index}")
+        return self.position
+
+    def next_block(self):
+        """First block to scan when catching up (the checkpoint block may hold later logs)"""
+        if self.position is None:
+            return None
+        block_number, log_index = self.position
+        return block_number + 1 if log_index == SCANNED_LOG_INDEX else block_number
+
+    def seen(self, position):
+        if self.position is not None and position <= self.position:
+            return True
+        return position in self._pending or position in self._finished
+
+    def begin(self, position, count=1):
+        """Register a log about to be processed, returning False if it was already seen"""
+        if self.seen(position):
+            return False
+        if count <= 0:
+            # Nothing left to do for this log (e.g. every image was already processed)
+            heapq.heappush(self._finished, position)
+            self._advance()
+            return True
+        self._pending[position] = count
+        return True
+
+    def scanned(self, to_block):
+        """Record that every log up to to_block was handed to begin(), even if there were none.
+
+        The checkpoint moves to the end of to_block once nothing at or below it
+        is still pending, so quiet ranges are not scanned again after a restart.
+        """
+        mark = (to_block, SCANNED_LOG_INDEX)
+        if self._scanned is None or mark > self._scanned:
+            self._scanned = mark
+        self._advance()
+
+    def task_done(self, position):
+        remaining = self._pending.get(position)
+        if remaining is None:
+            return
+        if remaining > 1:
+            self._pending[position] = remaining - 1
+            return
+        del self._pending[position]
+        heapq.heappush(self._finished, position)
+        self._advance()
+
+    def _advance(self):
+        lowest_pending = min(self._pending) if self._pending else None
+        moved = False
+        while self._finished and (lowest_pending is None or self._finished[0] < lowest_pending):
+            self.position = heapq.heappop(self._finished)
+            moved = True
+        if (self._scanned is not None
+                and (self.position is None or self._scanned > self.position)
+                and (lowest_pending is None or self._scanned < lowest_pending)):
+            self.position = self._scanned
+            moved = True
+        if moved:
+            self._dirty = True
+            if self._save_task is None or self._save_task.done():
+                self._save_task = asyncio.create_task(self._save())
+
+    async def _save(self):
+        # Coalesce bursts of completions into as few writes as possible
+        while self._dirty:
+            self._dirty = False
+            block_number, log_index = self.position
+            try:
+                await BlockCheckpoint.objects.aupdate_or_create(
+                    name=self.name,
+                    defaults={"block_number": block_number, "log_index": log_index},
+                )
+            except Exception as e:
+                logger.error(f"Failed to save checkpoint {self.name}: {e}")
+                return
+        logger.debug(f"Checkpoint {self.name} saved at {self.position}")
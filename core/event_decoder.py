@@ -0,0 +1,58 @@
+import logging
+from typing import NamedTuple
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_abi.registry import registry
+from eth_utils import event_abi_to_log_topic, hexstr_if_str, to_bytes, to_checksum_address, to_hex
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+IMAGE_SUBMITTED_ABI = {
+    "anonymous":False,"inputs":[{"indexed":False,"internalType":"address","name":"_user","type":"address"},{"indexed":False,"internalType":"string","name":"imageUrl","type":"string"}],"name":"ImageSubmitted","type":"event"
+}
+
+# Compiled once at import: topic hash, non-indexed type list and the tuple decoder for them
+IMAGE_SUBMITTED_TOPIC = to_hex(event_abi_to_log_topic(IMAGE_SUBMITTED_ABI))
+_TOPIC_BYTES = to_bytes(hexstr=IMAGE_SUBMITTED_TOPIC)
+_DATA_TYPES = tuple(item["type"] for item in IMAGE_SUBMITTED_ABI["inputs"] if not item["indexed"])
+_data_decoder = TupleDecoder(decoders=tuple(registry.get_decoder(type_str) for type_str in _DATA_TYPES))
+
+
+class ImageSubmitted(NamedTuple):
+    user: str
+    image_url: str
+    tx_hash: str
+    block_number: int
+    log_index: int
+
+    @property
+    def position(self):
+        return (self.block_number, self.log_index)
+
+
+def decode_log(log):
+    """Decode a raw ImageSubmitted log into an ImageSubmitted record"""
+    topics = log["topics"]
+    if not topics or hexstr_if_str(to_bytes, topics[0]) != _TOPIC_BYTES:
+        raise ValueError(f"Log is not an ImageSubmitted event: {topics[0] if topics else None}")
+    data = hexstr_if_str(to_bytes, log["data"])
+    user, image_url = _data_decoder(ContextFramesBytesIO(data))
+    tx_hash = log["transactionHash"]
+    return ImageSubmitted(
+        user=to_checksum_address(user),
+        image_url=image_url,
+        tx_hash=tx_hash.hex() if hasattr(tx_hash, "hex") else tx_hash,
+        block_number=log["blockNumber"],
+        log_index=log["logIndex"],
+    )
+
+
+def decode_logs(logs):
+    """Decode a list of logs in order, skipping any that are not ImageSubmitted events"""
+    events = []
+    for log in logs:
+        try:
+            events.append(decode_log(log))
+        except Exception as e:
+            logger.warning(f"Skipping undecodable log in block {log.get('blockNumber')}: {e}")
+    return events
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from web3 import Web3
+from .web3_client import get_contract
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+FARMER_CACHE_SIZE = int(os.getenv('FARMER_CACHE_SIZE', '10000'))
+FARMER_CACHE_TTL = float(os.getenv('FARMER_CACHE_TTL', '3600'))
+
+
+class FarmerInfo(NamedTuple):
+    level: int
+    adhar_id: int
+    auth_points: int
+    correct_report_count: int
+
+
+def fetch_farmer(address):
+    """Read a farmer's profile from the contract's farmer_map"""
+    logger.info(f"Fetching farmer information from blockchain for {address}...")
+    farmer_info = get_contract().functions.farmer_map(address).call()
+    return FarmerInfo(
+        level=farmer_info[0],
+        adhar_id=farmer_info[1],
+        auth_points=farmer_info[2],
+        correct_report_count=farmer_info[6],
+    )
+
+
+class FarmerCache:
+    """Bounded TTL/LRU cache of farmer_map lookups keyed by checksum address"""
+
+    def __init__(self, maxsize=FARMER_CACHE_SIZE, ttl=FARMER_CACHE_TTL, loader=fetch_farmer):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, info):
+        with self._lock:
+            self._entries[key] = (info, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, address):
+        """Return the FarmerInfo for an address, reading the contract only on a miss"""
+        key = Web3.to_checksum_address(address)
+        info = self._lookup(key)
+        if info is None:
+            info = self.loader(key)
+            self._store(key, info)
+        return info
+
+    def get_aadhar(self, address):
+        return self.get(address).adhar_id
+
+    def invalidate(self, address=None):
+        with self._lock:
+            if address is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Web3.to_checksum_address(address), None)
+
+    def warm_up(self, limit=None):
+        """Preload the cache from the contract's get_farmers list"""
+        addresses = get_contract().functions.get_farmers().call()
+        if limit is not None:
+            addresses = addresses[-limit:]
+        loaded = 0
+        for address in addresses:
+            try:
+                key = Web3.to_checksum_address(address)
+                self._store(key, self.loader(key))
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"Could not preload farmer {address}: {e}")
+        logger.info(f"Farmer cache warmed up with {loaded} of {len(addresses)} farmers")
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+farmer_cache = FarmerCache()
@@ -1,46 +1,28 @@
 import logging
-import os
-from web3 import Web3
-from dotenv import load_dotenv
-from CropChain.settings import BASE_DIR
-
-load_dotenv(os.path.join(BASE_DIR, '.env'))
+from .web3_client import get_async_contract
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
-abi = os.getenv('ABI')
-w3 = Web3(Web3.HTTPProvider(os.getenv('HTTP_PROVIDER_1')))
+SEPARATOR = "$$$"
+
+def iter_pending_urls(raw):
+    """Yield the URLs of a `$$$`-joined contract string one by one without building a list"""
+    start = 0
+    while raw:
+        end = raw.find(SEPARATOR, start)
+        if end == -1:
+            yield raw[start:]
+            return
+        yield raw[start:end]
+        start = end + len(SEPARATOR)
+
+def count_pending_urls(raw):
+    return raw.count(SEPARATOR) + 1 if raw else 0
 
-def get_pending_images():
-    """Get pending images from blockchain with proper logging"""
-    try:
-        logger.info("Fetching pending images from blockchain...")
-        
-        # Check Web3 connection
-        if not w3.is_connected():
-            logger.error("Failed to connect to Ethereum network")
-            return []
-            
-        logger.info("Connected to Ethereum network")
-        
-        # Get contract instance
-        contract = w3.eth.contract(address= os.getenv('CONTRACT_ADDRESS'), abi=abi)
-        logger.info("Contract loaded successfully")
-        
-        # Call the contract function
-        logger.info("Calling get_pending_images() on contract...")
-        urls = contract.functions.get_pending_images().call()
-        
-        if urls:
-            url_list = urls.split("$$$")
-            logger.info(f"Found {len(url_list)} pending images")
-            logger.debug(f"Pending images: {url_list}")
-            return url_list
-        else:
-            logger.info("No pending images found")
-            return []
-            
-    except Exception as e:
-        logger.error(f"Error fetching pending images: {e}", exc_info=True)
-        return []
+async def afetch_pending_raw():
+    """Read the `$$$`-joined pending image string from the contract, raising on RPC errors"""
+    logger.info("Calling get_pending_images() on contract...")
+    raw = await get_async_contract().functions.get_pending_images().call()
+    logger.info(f"Found {count_pending_urls(raw)} pending images")
+    return raw
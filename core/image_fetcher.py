@@ -0,0 +1,116 @@
+import logging
+import os
+from io import BytesIO
+import aiohttp
+import numpy as np
+from PIL import Image
+from .run_ai_on_images import AI_INPUT_SIZE
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.getenv('IMAGE_FETCH_TIMEOUT', '30'))
+IMAGE_CONN_LIMIT = int(os.getenv('IMAGE_CONN_LIMIT', '100'))
+IMAGE_CONN_PER_HOST = int(os.getenv('IMAGE_CONN_PER_HOST', '8'))
+IMAGE_CHUNK_SIZE = 64 * 1024
+# PNG and WebP have no reduced-scale decode, so their full pixel count is bounded instead
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', str(40_000_000)))
+# Bytes needed to recognise every accepted format
+SIGNATURE_BYTES = 12
+ALLOWED_CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp")
+
+# Leading bytes of the formats we accept, checked on the first chunk
+_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n")
+
+
+class ImageFetchError(Exception):
+    """The URL does not point to an image we are willing to process"""
+
+
+def _looks_like_image(head):
+    if head.startswith(_SIGNATURES):
+        return True
+    return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+
+
+class ImageFetcher:
+    """Streams images over a pooled aiohttp session with per-host limits and a byte cap"""
+
+    def __init__(self, max_bytes=IMAGE_MAX_BYTES, timeout=IMAGE_FETCH_TIMEOUT,
+                 limit=IMAGE_CONN_LIMIT, limit_per_host=IMAGE_CONN_PER_HOST):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def fetch(self, url):
+        """Download an image, rejecting wrong types and oversized bodies before reading them in full"""
+        async with self._get_session().get(url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in ALLOWED_CONTENT_TYPES and content_type != "application/octet-stream":
+                raise ImageFetchError(f"Unsupported Content-Type {content_type} for {url}")
+            if response.content_length is not None and response.content_length > self.max_bytes:
+                raise ImageFetchError(f"Image {url} is {response.content_length} bytes (limit {self.max_bytes})")
+
+            data = bytearray()
+            sniffed = False
+            async for chunk in response.content.iter_chunked(IMAGE_CHUNK_SIZE):
+                data.extend(chunk)
+                # Chunks can be tiny, so wait until the whole signature has arrived
+                if not sniffed and len(data) >= SIGNATURE_BYTES:
+                    if not _looks_like_image(bytes(data[:SIGNATURE_BYTES])):
+                        raise ImageFetchError(f"{url} is not a JPEG, PNG or WebP image")
+                    sniffed = True
+                if len(data) > self.max_bytes:
+                    raise ImageFetchError(f"Image {url} exceeds {self.max_bytes} bytes")
+            if not sniffed and not _looks_like_image(bytes(data)):
+                raise ImageFetchError(f"{url} is not a JPEG, PNG or WebP image")
+            return bytes(data)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def decode_image(data, size=AI_INPUT_SIZE):
+    """Decode image bytes straight to a (size, size, 3) uint8 array.
+
+    JPEGs are decoded at a reduced DCT scale via draft(), so full-resolution
+    pixels are never held for large phone photos. PNG and WebP are decoded in
+    full before reduce() shrinks them, so they are rejected above
+    IMAGE_MAX_PIXELS. Corrupt, truncated or oversized files raise
+    ImageFetchError like any other unusable upload.
+    """
+    try:
+        return _decode(data, size)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError and truncated reads are OSErrors
+        raise ImageFetchError(f"Could not decode image: {e}") from e
+
+
+def _decode(data, size):
+    with Image.open(BytesIO(data)) as image:
+        image.draft("RGB", (size, size))
+        if image.format != "JPEG" and image.width * image.height > IMAGE_MAX_PIXELS:
+            raise ImageFetchError(f"{image.format} image of {image.width}x{image.height} exceeds {IMAGE_MAX_PIXELS} pixels")
+        factor = min(image.width // size, image.height // size)
+        if factor > 1:
+            image = image.reduce(factor)
+        image = image.convert("RGB").resize((size, size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+
+image_fetcher = ImageFetcher()
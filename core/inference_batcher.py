@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+AI_BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', '16'))
+AI_BATCH_WAIT = float(os.getenv('AI_BATCH_WAIT_MS', '50')) / 1000
+AI_MAX_INFLIGHT_BATCHES = int(os.getenv('AI_MAX_INFLIGHT_BATCHES', '2'))
+
+
+class MicroBatcher:
+    """Collects single items into batches of up to max_batch_size or max_wait seconds.
+
+    ``run_batch(items)`` is awaited once per batch and must return one result
+    per item, in order; each caller of ``submit`` gets its own result back.
+    """
+
+    def __init__(self, run_batch, max_batch_size=AI_BATCH_SIZE, max_wait=AI_BATCH_WAIT,
+                 max_inflight=AI_MAX_INFLIGHT_BATCHES, name="batch"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = None
+        self._task = None
+        # Strong references so running batches are not garbage collected mid-flight
+        self._batches = set()
+        self._inflight = asyncio.Semaphore(max(1, max_inflight))
+
+    async def submit(self, item):
+        """Add an item to the next batch and wait for its result"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._collect(), name=f"{self.name}-batcher")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Bound concurrent batches so the model is not flooded while it catches up
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch):
+        try:
+            items = [item for item, _ in batch]
+            logger.info(f"Running {self.name} batch of {len(items)}")
+            results = await self.run_batch(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
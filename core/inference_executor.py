@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .run_ai_on_images import run_ai_on_batch
+from .model_registry import model_registry
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+AI_WORKERS = int(os.getenv('AI_WORKERS', str(os.cpu_count() or 1)))
+# CPUs the model may run on, e.g. "0-3,6"; empty means no restriction
+AI_CPU_AFFINITY = os.getenv('AI_CPU_AFFINITY', '')
+# Pin each worker to a single CPU from AI_CPU_AFFINITY instead of sharing the whole set
+AI_PIN_WORKERS = os.getenv('AI_PIN_WORKERS', 'false').lower() == 'true'
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '120'))
+AI_START_METHOD = os.getenv('AI_START_METHOD', 'spawn')
+# Load and warm the active model in each worker as it starts instead of on its first batch
+AI_WARM_UP = os.getenv('AI_WARM_UP', 'true').lower() == 'true'
+
+
+def parse_cpu_list(value):
+    """Parse a CPU list such as "0-3,6" into a sorted list of CPU ids"""
+    cpus = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def _init_worker(cpus, pin, counter, warm_up):
+    """Pool initializer: apply the CPU affinity for this worker process and warm the model"""
+    if warm_up:
+        try:
+            model_registry.warm_up()
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}", exc_info=True)
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    if pin:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        cpus = [cpus[index % len(cpus)]]
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError as e:
+        logger.warning(f"Could not set CPU affinity {cpus}: {e}")
+
+
+class InferenceExecutor:
+    """Runs model inference in a process pool so the event loop never blocks on it.
+
+    The pool is created on first use, so processes that only import core
+    (e.g. Django web workers) never start it.
+    """
+
+    def __init__(self, workers=AI_WORKERS, cpu_affinity=AI_CPU_AFFINITY,
+                 pin_workers=AI_PIN_WORKERS, timeout=AI_TIMEOUT, start_method=AI_START_METHOD):
+        self.workers = max(1, workers)
+        self.cpus = parse_cpu_list(cpu_affinity) if cpu_affinity else []
+        self.pin_workers = pin_workers
+        self.timeout = timeout
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.cpus, self.pin_workers, context.Value("i", 0), AI_WARM_UP),
+                )
+                logger.info(f"Started inference pool with {self.workers} workers (CPUs: {self.cpus or 'all'})")
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args, timeout=None):
+        """Run fn(*args) in the pool and await its result, giving up after `timeout` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            # The worker keeps running the call, only the caller stops waiting
+            logger.error(f"Inference {fn.__name__} timed out after {timeout}s")
+            raise
+        except BrokenProcessPool:
+            logger.error("Inference pool broke (worker crashed), restarting it")
+            self._reset_pool(pool)
+            raise
+
+    async def run_ai_batch(self, images, timeout=None):
+        # The parent only decides the version; workers load (and swap to) it themselves
+        return await self.run(run_ai_on_batch, list(images), model_registry.active_version, timeout=timeout)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+            logger.info("Inference pool stopped")
+
+
+inference_executor = InferenceExecutor()
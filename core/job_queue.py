@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+class FairQueue:
+    """Bounded queue with weighted priority classes and round-robin between owners.
+
+    Jobs are grouped by ``priority(job)`` (0 is the highest class) and, within a
+    class, by ``key(job)``. Classes are served in proportion to ``weights`` so
+    low classes still make progress, and each owner gets one job per turn so a
+    single busy owner cannot starve the others. Mirrors the asyncio.Queue API
+    used by JobQueue.
+    """
+
+    def __init__(self, maxsize=0, key=None, priority=None, weights=(4, 2, 1)):
+        self.maxsize = maxsize
+        self.key = key or (lambda job: None)
+        self.priority = priority or (lambda job: 0)
+        self.weights = list(weights)
+        self._classes = [OrderedDict() for _ in self.weights]
+        self._credits = list(self.weights)
+        self._size = 0
+        self._unfinished = 0
+        self._changed = asyncio.Condition()
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self):
+        return self._size
+
+    def full(self):
+        return 0 < self.maxsize <= self._size
+
+    async def put(self, job):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self.full())
+            level = min(max(int(self.priority(job)), 0), len(self._classes) - 1)
+            owners = self._classes[level]
+            owner = self.key(job)
+            if owner not in owners:
+                owners[owner] = deque()
+            owners[owner].append(job)
+            self._size += 1
+            self._unfinished += 1
+            self._finished.clear()
+            self._changed.notify_all()
+
+    def _next_class(self):
+        ready = [level for level, owners in enumerate(self._classes) if owners]
+        if not any(self._credits[level] > 0 for level in ready):
+            self._credits = list(self.weights)
+        for level in ready:
+            if self._credits[level] > 0:
+                self._credits[level] -= 1
+                return level
+        return ready[0]
+
+    async def get(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._size > 0)
+            owners = self._classes[self._next_class()]
+            owner, jobs = next(iter(owners.items()))
+            job = jobs.popleft()
+            # Rotate the owner to the back of its class so others go first next time
+            del owners[owner]
+            if jobs:
+                owners[owner] = jobs
+            self._size -= 1
+            self._changed.notify_all()
+            return job
+
+    def task_done(self):
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+
+class JobQueue:
+    """Bounded asyncio job queue drained by a fixed number of worker tasks.
+
+    Passing ``key`` and/or ``priority`` switches from FIFO to a FairQueue.
+    """
+
+    def __init__(self, handler, workers=4, maxsize=100, name="jobs", key=None, priority=None, weights=(4, 2, 1)):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.maxsize = max(0, int(maxsize))
+        self.name = name
+        self.key = key
+        self.priority = priority
+        self.weights = weights
+        self._queue = None
+        self._tasks = []
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Create the queue and spawn the workers on the running loop"""
+        if self.running:
+            return
+        if self.key is not None or self.priority is not None:
+            self._queue = FairQueue(self.maxsize, self.key, self.priority, self.weights)
+        else:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} {self.name} workers (queue size {self.maxsize or 'unbounded'})")
+
+    async def put(self, job):
+        """Enqueue a job, waiting for a free slot when the queue is full"""
+        if not self.running:
+            await self.start()
+        if self._queue.full():
+            logger.warning(f"{self.name} queue is full ({self.maxsize}), waiting for a free slot")
+        await self._queue.put(job)
+
+    async def join(self):
+        """Wait until every queued job has been handled"""
+        if self._queue:
+            await self._queue.join()
+
+    async def stop(self, drain=True):
+        """Stop the workers, optionally letting them finish queued jobs first"""
+        if not self.running:
+            return
+        if drain:
+            await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Stopped {self.name} workers")
+
+    async def _worker(self, index):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.handler(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} worker {index} failed on job {job}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
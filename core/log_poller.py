@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv('LOG_POLL_INTERVAL', '5'))
+POLL_MIN_RANGE = int(os.getenv('LOG_POLL_MIN_RANGE', '1'))
+POLL_MAX_RANGE = int(os.getenv('LOG_POLL_MAX_RANGE', '2000'))
+POLL_INITIAL_RANGE = int(os.getenv('LOG_POLL_INITIAL_RANGE', '100'))
+# Shrink the range when a single request returns more logs than this
+POLL_TARGET_LOGS = int(os.getenv('LOG_POLL_TARGET_LOGS', '500'))
+
+
+class LogPoller:
+    """Follows contract logs over HTTP with eth_getLogs, adapting the block range to the provider.
+
+    ``handler`` receives each non-empty batch of logs in chain order, and
+    ``on_scanned(to_block)``, if given, is called after every handled range,
+    including empty ones.
+    """
+
+    def __init__(self, w3, address, topics, handler, from_block=None,
+                 poll_interval=POLL_INTERVAL, min_range=POLL_MIN_RANGE,
+                 max_range=POLL_MAX_RANGE, initial_range=POLL_INITIAL_RANGE,
+                 target_logs=POLL_TARGET_LOGS, on_scanned=None):
+        self.w3 = w3
+        self.address = address
+        self.topics = topics
+        self.handler = handler
+        self.next_block = from_block
+        self.poll_interval = poll_interval
+        self.min_range = min_range
+        self.max_range = max_range
+        self.block_range = max(min_range, min(initial_range, max_range))
+        self.target_logs = target_logs
+        self.on_scanned = on_scanned
+
+    def _shrink(self):
+        self.block_range = max(self.min_range, self.block_range // 2)
+
+    def _grow(self):
+        self.block_range = min(self.max_range, self.block_range * 2)
+
+    async def poll_once(self):
+        """Fetch and handle the next block range, returning True once caught up with the head"""
+        latest = await self.w3.eth.block_number
+        if self.next_block is None:
+            self.next_block = latest
+        if self.next_block > latest:
+            return True
+
+        to_block = min(latest, self.next_block + self.block_range - 1)
+        try:
+            logs = await self.w3.eth.get_logs({
+                "address": self.address,
+                "topics": self.topics,
+                "fromBlock": self.next_block,
+                "toBlock": to_block,
+            })
+        except Exception as e:
+            # Providers cap the block span or result size, retry with a smaller window
+            if self.block_range <= self.min_range:
+                raise
+            self._shrink()
+            logger.warning(f"eth_getLogs {self.next_block}-{to_block} failed ({e}), range now {self.block_range} blocks")
+            return False
+
+        if logs:
+            await self.handler(logs)
+        logger.debug(f"Polled blocks {self.next_block}-{to_block}: {len(logs)} logs")
+        if self.on_scanned is not None:
+            self.on_scanned(to_block)
+
+        if len(logs) > self.target_logs:
+            self._shrink()
+        elif len(logs) < self.target_logs // 4:
+            self._grow()
+        self.next_block = to_block + 1
+        return to_block >= latest
+
+    async def run(self, stop_event=None):
+        """Poll until stop_event is set, sleeping only when caught up with the chain head"""
+        logger.info(f"Polling logs for {self.address} every {self.poll_interval}s")
+        while stop_event is None or not stop_event.is_set():
+            try:
+                caught_up = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Log polling failed: {e}")
+                caught_up = True
+            if caught_up:
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-16 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_url', models.CharField(max_length=500)),
+                ('tx_hash', models.CharField(max_length=66)),
+                ('user', models.CharField(max_length=42)),
+                ('block_number', models.BigIntegerField(blank=True, null=True)),
+                ('log_index', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('stage', models.CharField(choices=[('ai', 'AI'), ('upload', 'Upload'), ('notify', 'Notify'), ('done', 'Done')], default='ai', max_length=10)),
+                ('ai_result', models.TextField(blank=True)),
+                ('result_tx_hash', models.CharField(blank=True, max_length=66)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('lease_owner', models.CharField(blank=True, max_length=100)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'lease_expires_at'], name='image_job_claim_idx'), models.Index(fields=['image_url', 'status'], name='image_job_url_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('image_url', 'tx_hash'), name='unique_image_job')],
+            },
+        ),
+    ]
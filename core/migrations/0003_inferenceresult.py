@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-16 11:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_imagejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InferenceResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model_version', models.CharField(max_length=50)),
+                ('label', models.CharField(max_length=100)),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='inference_result_lru_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'model_version'), name='unique_inference_result')],
+            },
+        ),
+    ]
@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+from pathlib import Path
+import numpy as np
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Layout: <AI_MODEL_DIR>/<version>/*.npy (+ optional labels.txt), <AI_MODEL_DIR>/ACTIVE holds the live version
+AI_MODEL_DIR = Path(os.getenv('AI_MODEL_DIR', Path(__file__).resolve().parent.parent / 'models'))
+AI_MODEL_VERSION = os.getenv('AI_MODEL_VERSION', 'mock-1')
+DEFAULT_LABELS = ["Safe", "Unsafe"]
+
+
+class LoadedModel:
+    """A model version whose weights are memory-mapped read-only from .npy files.
+
+    With ``weight.npy`` (features x classes) and optional ``bias.npy`` present
+    it acts as a linear classifier over the flattened input; without weights it
+    is the mock model that reports every image as safe.
+    """
+
+    def __init__(self, version, weights, labels):
+        self.version = version
+        self.weights = weights
+        self.labels = labels
+
+    def predict(self, batch):
+        """Return one label per item of a preprocessed (N, C, H, W) batch"""
+        weight = self.weights.get("weight")
+        if weight is None:
+            predictions = np.zeros(len(batch), dtype=np.int64)
+        else:
+            logits = batch.reshape(len(batch), -1) @ weight
+            bias = self.weights.get("bias")
+            if bias is not None:
+                logits += bias
+            predictions = logits.argmax(axis=1)
+        return [self.labels[int(prediction)] for prediction in predictions]
+
+
+class ModelRegistry:
+    """Loads model versions on first use and swaps the active version without a restart"""
+
+    def __init__(self, model_dir=AI_MODEL_DIR, default_version=AI_MODEL_VERSION):
+        self.model_dir = Path(model_dir)
+        self.default_version = default_version
+        self._models = {}
+        self._lock = threading.Lock()
+        self._active = None
+        self._active_mtime = None
+
+    @property
+    def active_version(self):
+        """The live version, re-read from the ACTIVE file whenever it changes on disk"""
+        marker = self.model_dir / "ACTIVE"
+        try:
+            mtime = marker.stat().st_mtime
+        except OSError:
+            return self._active or self.default_version
+        if mtime != self._active_mtime:
+            self._active = marker.read_text().strip() or self.default_version
+            self._active_mtime = mtime
+            logger.info(f"Active model version is {self._active}")
+        return self._active
+
+    def _load(self, version):
+        path = self.model_dir / version
+        weights = {}
+        labels = DEFAULT_LABELS
+        if path.is_dir():
+            for weight_file in sorted(path.glob("*.npy")):
+                # mmap keeps the weights in the page cache, shared by every pool worker
+                weights[weight_file.stem] = np.load(weight_file, mmap_mode="r")
+            labels_file = path / "labels.txt"
+            if labels_file.exists():
+                labels = [line.strip() for line in labels_file.read_text().splitlines() if line.strip()]
+        else:
+            logger.warning(f"No weights found for model {version} in {path}, using the mock model")
+        logger.info(f"Loaded model {version} ({len(weights)} weight arrays)")
+        return LoadedModel(version, weights, labels)
+
+    def get(self, version=None):
+        """Return the requested (default: active) model, loading it on first use"""
+        version = version or self.active_version
+        model = self._models.get(version)
+        if model is None:
+            with self._lock:
+                model = self._models.get(version)
+                if model is None:
+                    model = self._load(version)
+                    # Keep only the newest version so a swap does not double memory use
+                    self._models = {version: model}
+        return model
+
+    def activate(self, version):
+        """Hot-swap to another version: load and warm it first, then publish it in ACTIVE"""
+        self.warm_up(version)
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        (self.model_dir / "ACTIVE").write_text(version)
+        self._active = version
+        logger.info(f"Activated model version {version}")
+
+    def warm_up(self, version=None, input_size=None):
+        """Load a model and run one dummy batch through it so the first real call is not slow"""
+        from .run_ai_on_images import AI_INPUT_SIZE
+        size = input_size or AI_INPUT_SIZE
+        model = self.get(version)
+        model.predict(np.zeros((1, 3, size, size), dtype=np.float32))
+        return model
+
+
+model_registry = ModelRegistry()
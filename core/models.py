@@ -1,3 +1,145 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
+from django.utils import timezone
 
-# Create your models here.
+
+class BlockCheckpoint(models.Model):
+    """Last fully processed event position of a chain listener"""
+    name = models.CharField(max_length=100, unique=True)
+    block_number = models.BigIntegerField()
+    log_index = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}@{self.block_number}:{self.log_index}"
+
+
+class ImageJobQuerySet(models.QuerySet):
+    def claimable(self):
+        now = timezone.now()
+        return self.filter(
+            status__in=(ImageJob.STATUS_PENDING, ImageJob.STATUS_RUNNING),
+        ).filter(
+            models.Q(lease_expires_at__isnull=True) | models.Q(lease_expires_at__lt=now)
+        )
+
+    def claim(self, owner, limit=10, lease_seconds=600):
+        """Lease up to `limit` unleased or expired jobs to `owner` and return them.
+
+        Rows are locked with SKIP LOCKED where the database supports it, so
+        several worker processes can claim from the same table safely.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                self.claimable()
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            # Re-check the lease in the UPDATE for databases without row locks
+            self.claimable().filter(id__in=ids).update(
+                status=ImageJob.STATUS_RUNNING,
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=models.F("attempts") + 1,
+                updated_at=now,
+            )
+        return list(self.filter(id__in=ids, lease_owner=owner, lease_expires_at__gt=now).order_by("id"))
+
+    def renew(self, job_id, owner, attempts, lease_seconds=600):
+        """Extend a lease if `owner` still holds it from the claim that produced `attempts`.
+
+        Returns 0 when the job was re-claimed by another worker, or by a later
+        claim in this process, so that stale copy must not run.
+        """
+        now = timezone.now()
+        return self.filter(
+            id=job_id, lease_owner=owner, attempts=attempts, status=ImageJob.STATUS_RUNNING,
+        ).update(lease_expires_at=now + timedelta(seconds=lease_seconds), updated_at=now)
+
+    def release(self, job_id, owner, **fields):
+        """Update a leased job and give up the lease"""
+        values = {"lease_owner": "", "lease_expires_at": None, "updated_at": timezone.now()}
+        values.update(fields)
+        return self.filter(id=job_id, lease_owner=owner).update(**values)
+
+
+class ImageJob(models.Model):
+    """Durable pipeline state for one image of an ImageSubmitted event"""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    STAGE_AI = "ai"
+    STAGE_UPLOAD = "upload"
+    STAGE_NOTIFY = "notify"
+    STAGE_DONE = "done"
+    STAGE_CHOICES = [
+        (STAGE_AI, "AI"),
+        (STAGE_UPLOAD, "Upload"),
+        (STAGE_NOTIFY, "Notify"),
+        (STAGE_DONE, "Done"),
+    ]
+
+    image_url = models.CharField(max_length=500)
+    tx_hash = models.CharField(max_length=66)
+    user = models.CharField(max_length=42)
+    block_number = models.BigIntegerField(null=True, blank=True)
+    log_index = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stage = models.CharField(max_length=10, choices=STAGE_CHOICES, default=STAGE_AI)
+    ai_result = models.TextField(blank=True)
+    result_tx_hash = models.CharField(max_length=66, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImageJobQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["image_url", "tx_hash"], name="unique_image_job"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "lease_expires_at"], name="image_job_claim_idx"),
+            models.Index(fields=["image_url", "status"], name="image_job_url_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.image_url} ({self.stage}/{self.status})"
+
+
+class InferenceResult(models.Model):
+    """Model output cached by image content hash, so re-uploaded photos skip inference"""
+    content_hash = models.CharField(max_length=64)
+    model_version = models.CharField(max_length=50)
+    label = models.CharField(max_length=100)
+    # Size of the source image, for statistics only; the image itself is not stored
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "model_version"], name="unique_inference_result"),
+        ]
+        indexes = [
+            models.Index(fields=["last_used_at"], name="inference_result_lru_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.model_version}): {self.label}"
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Quiet period after the last image before the push goes out
+NOTIFY_COALESCE_WINDOW = float(os.getenv('NOTIFY_COALESCE_WINDOW', '5'))
+# Upper bound on how long a busy farmer's push can be held back
+NOTIFY_COALESCE_MAX_DELAY = float(os.getenv('NOTIFY_COALESCE_MAX_DELAY', '30'))
+# FCM payloads are capped at 4KB, so image IDs are listed only up to this many bytes
+NOTIFY_MAX_IMAGE_ID_BYTES = int(os.getenv('NOTIFY_MAX_IMAGE_ID_BYTES', '3000'))
+
+
+def join_within(image_ids, max_bytes, separator="$$$"):
+    """Join as many leading image IDs as fit in max_bytes of UTF-8"""
+    joined = ""
+    for image_id in image_ids:
+        candidate = joined + separator + image_id if joined else image_id
+        if len(candidate.encode()) > max_bytes:
+            break
+        joined = candidate
+    return joined
+
+
+class PendingNotification:
+    def __init__(self, first_seen):
+        self.first_seen = first_seen
+        self.image_ids = []
+        self.handle = None
+
+
+class NotificationCoalescer:
+    """Debounces notifications per Aadhaar ID and sends one push for all images in the window"""
+
+    def __init__(self, send, window=NOTIFY_COALESCE_WINDOW, max_delay=NOTIFY_COALESCE_MAX_DELAY,
+                 max_image_id_bytes=NOTIFY_MAX_IMAGE_ID_BYTES):
+        self.send = send
+        self.window = window
+        self.max_delay = max_delay
+        self.max_image_id_bytes = max_image_id_bytes
+        self._pending = {}
+        self._tasks = set()
+
+    def add(self, aadhaar, image_id):
+        """Record a processed image; the push is sent once the farmer has been quiet for the window"""
+        loop = asyncio.get_running_loop()
+        aadhaar = str(aadhaar)
+        pending = self._pending.get(aadhaar)
+        if pending is None:
+            pending = self._pending[aadhaar] = PendingNotification(loop.time())
+        else:
+            pending.handle.cancel()
+        pending.image_ids.append(image_id)
+        delay = min(self.window, pending.first_seen + self.max_delay - loop.time())
+        pending.handle = loop.call_later(max(delay, 0), self._flush, aadhaar)
+
+    def _flush(self, aadhaar):
+        pending = self._pending.pop(aadhaar, None)
+        if pending is None:
+            return
+        task = asyncio.create_task(self._send(aadhaar, pending.image_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, aadhaar, image_ids):
+        count = len(image_ids)
+        logger.info(f"Sending one notification to Aadhar ID {aadhaar} for {count} images")
+        try:
+            await self.send(
+                aadhaar,
+                title="AI review ready",
+                body=f"{count} of your images have been reviewed" if count > 1 else "Your image has been reviewed",
+                data={"count": count, "imageIds": join_within(image_ids, self.max_image_id_bytes)},
+            )
+        except Exception as e:
+            logger.error(f"Error sending coalesced notification to {aadhaar}: {e}", exc_info=True)
+
@@ -0,0 +1,67 @@
+import hashlib
+import logging
+import os
+import time
+from django.core.cache import cache
+from .get_pending_images import afetch_pending_raw, count_pending_urls
+from .web3_client import get_async_web3
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# How long a fetched block number is trusted before asking the node again
+PENDING_BLOCK_TTL = float(os.getenv('PENDING_BLOCK_TTL', '2'))
+# Entries are keyed by block, so this only bounds how long old blocks linger in the cache
+PENDING_CACHE_TTL = int(os.getenv('PENDING_CACHE_TTL', '300'))
+GENERATION_KEY = "pending_images:generation"
+
+
+class PendingImagesCache:
+    """Caches the raw pending image string per (generation, latest block number).
+
+    The contract state can only change in a new block, so a response stays
+    valid until the block number moves. The generation counter lets the
+    pipeline drop the entry as soon as it submits or confirms work, without
+    waiting for the next block lookup. With a shared Django cache backend the
+    bump reaches every web process.
+    """
+
+    def __init__(self, async_loader=afetch_pending_raw, block_ttl=PENDING_BLOCK_TTL, ttl=PENDING_CACHE_TTL):
+        self.async_loader = async_loader
+        self.block_ttl = block_ttl
+        self.ttl = ttl
+        self._block = None
+        self._block_checked = 0.0
+
+    async def ablock_number(self):
+        """Latest block number, fetched at most once per block_ttl by this process"""
+        # Two concurrent requests may both ask the node; that is harmless
+        if self._block is None or time.monotonic() - self._block_checked >= self.block_ttl:
+            self._block = await get_async_web3().eth.block_number
+            self._block_checked = time.monotonic()
+        return self._block
+
+    async def ainvalidate(self):
+        """Bump the generation so the next request refetches from the contract"""
+        try:
+            await cache.aincr(GENERATION_KEY)
+        except ValueError:
+            await cache.aset(GENERATION_KEY, 1, None)
+
+    def _entry(self, key, raw):
+        # Kept unsplit: pages and streams are cut from it lazily per request
+        raw = raw or ""
+        logger.info(f"Caching {count_pending_urls(raw)} pending images as {key}")
+        return raw, hashlib.sha1(raw.encode()).hexdigest()
+
+    async def aget(self):
+        """Return (raw `$$$`-joined string, digest) for the current block, calling the contract only on a miss"""
+        key = f"pending_images:{await cache.aget(GENERATION_KEY, 0)}:{await self.ablock_number()}"
+        entry = await cache.aget(key)
+        if entry is None:
+            entry = self._entry(key, await self.async_loader())
+            await cache.aset(key, entry, self.ttl)
+        return entry
+
+
+pending_images_cache = PendingImagesCache()
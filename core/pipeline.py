@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import NamedTuple
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from web3.exceptions import TransactionNotFound
+from dotenv import load_dotenv
+from fcm.dispatcher import dispatcher
+from CropChain.settings import BASE_DIR
+from .job_queue import JobQueue
+from .inference_executor import inference_executor
+from .inference_batcher import MicroBatcher
+from .image_fetcher import ImageFetchError, image_fetcher, decode_image
+from .run_ai_on_images import format_result
+from .model_registry import model_registry
+from .result_cache import content_hash, result_cache
+from .upload_result import uploadResult, handle_receipt, submitter
+from .receipt_tracker import ReceiptTracker
+from .web3_client import get_async_web3
+from .farmer_cache import farmer_cache
+from .checkpoint import CheckpointTracker
+from .pending_cache import pending_images_cache
+from .event_decoder import IMAGE_SUBMITTED_TOPIC, decode_log, decode_logs
+from .models import ImageJob
+from .send_notification import sendNotification
+from .notification_coalescer import NotificationCoalescer
+
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '4'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))
+# Durable job settings
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '600'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '60'))
+JOB_RECOVERY_INTERVAL = float(os.getenv('JOB_RECOVERY_INTERVAL', '30'))
+JOB_CLAIM_BATCH = int(os.getenv('JOB_CLAIM_BATCH', '10'))
+FARMER_CACHE_WARM_UP = os.getenv('FARMER_CACHE_WARM_UP', 'false').lower() == 'true'
+# Scheduling: class 0 (high reputation), 1 (normal), 2 (low); weights are jobs served per round
+PRIORITY_HIGH_LEVEL = int(os.getenv('PRIORITY_HIGH_LEVEL', '3'))
+PRIORITY_HIGH_POINTS = int(os.getenv('PRIORITY_HIGH_POINTS', '100'))
+# auth_points is unsigned, so the low class needs a positive threshold to ever apply
+PRIORITY_LOW_POINTS = int(os.getenv('PRIORITY_LOW_POINTS', '10'))
+PRIORITY_WEIGHTS = tuple(int(w) for w in os.getenv('PRIORITY_WEIGHTS', '4,2,1').split(','))
+
+# Lease owner name for jobs claimed by this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Strong references to fire-and-forget tasks started from callbacks
+_background_tasks = set()
+
+# Confirmations are watched in the background instead of blocking each upload
+receipt_tracker = ReceiptTracker(
+    get_async_web3(),
+    poll_interval=float(os.getenv('RECEIPT_POLL_INTERVAL', '2')),
+    timeout_blocks=int(os.getenv('RECEIPT_TIMEOUT_BLOCKS', '50')),
+)
+
+# Images from concurrent jobs are grouped so the model runs once per batch
+ai_batcher = MicroBatcher(inference_executor.run_ai_batch, name="ai")
+
+# Last fully processed ImageSubmitted log, used to catch up after reconnects
+checkpoint = CheckpointTracker("ImageSubmitted")
+
+# One push per farmer for all images finished within the debounce window
+notifier = NotificationCoalescer(sendNotification)
+
+
+class ImageTask(NamedTuple):
+    url: str
+    user: str
+    tx_hash: str
+    position: tuple = None
+    job_id: int = None
+    priority: int = 1
+    attempt: int = 0
+
+
+class LeaseLost(Exception):
+    """Another claim took over the job, so this copy must stop"""
+
+
+def record_jobs(user, urls, tx_hash, position=None):
+    """Create jobs for an event's images and claim them, skipping URLs that are already done"""
+    done = set(
+        ImageJob.objects.filter(image_url__in=urls, status=ImageJob.STATUS_DONE)
+        .values_list("image_url", flat=True)
+    )
+    new_urls = [url for url in dict.fromkeys(urls) if url not in done]
+    if done:
+        logger.info(f"Skipping {len(done)} already processed images")
+    if not new_urls:
+        return []
+    block_number, log_index = position if position is not None else (None, None)
+    ImageJob.objects.bulk_create(
+        [
+            ImageJob(image_url=url, tx_hash=tx_hash, user=user, block_number=block_number, log_index=log_index)
+            for url in new_urls
+        ],
+        ignore_conflicts=True,
+    )
+    # Replayed events hit the unique constraint; only unleased jobs come back from the claim
+    return ImageJob.objects.filter(image_url__in=new_urls, tx_hash=tx_hash).claim(
+        WORKER_ID, limit=len(new_urls), lease_seconds=JOB_LEASE_SECONDS
+    )
+
+
+def claim_jobs(limit):
+    return ImageJob.objects.claim(WORKER_ID, limit=limit, lease_seconds=JOB_LEASE_SECONDS)
+
+
+def farmer_priority(user):
+    """Priority class for a farmer from their on-chain level, auth points and correct reports"""
+    try:
+        info = farmer_cache.get(user)
+    except Exception as e:
+        logger.warning(f"Could not read farmer {user} for scheduling: {e}")
+        return 1
+    if info.level >= PRIORITY_HIGH_LEVEL or info.auth_points >= PRIORITY_HIGH_POINTS:
+        return 0
+    if info.auth_points < PRIORITY_LOW_POINTS and info.correct_report_count == 0:
+        return 2
+    return 1
+
+
+async def _queue_job(job, position=None):
+    priority = await asyncio.to_thread(farmer_priority, job.user)
+    await image_queue.put(ImageTask(
+        url=job.image_url, user=job.user, tx_hash=job.tx_hash,
+        position=position, job_id=job.id, priority=priority, attempt=job.attempts,
+    ))
+
+
+async def _renew_lease(task):
+    renewed = await sync_to_async(ImageJob.objects.renew)(task.job_id, WORKER_ID, task.attempt, JOB_LEASE_SECONDS)
+    if not renewed:
+        raise LeaseLost(f"Lease on job {task.job_id} was taken over")
+
+
+async def _save_stage(job, task, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    saved = await ImageJob.objects.filter(
+        id=job.id, lease_owner=WORKER_ID, attempts=task.attempt
+    ).aupdate(updated_at=timezone.now(), **fields)
+    if not saved:
+        raise LeaseLost(f"Lease on job {job.id} was taken over")
+
+
+async def classify_image(url):
+    """Fetch an image and return the model's label, reusing the result for identical bytes"""
+    data = await image_fetcher.fetch(url)
+    digest = await asyncio.to_thread(content_hash, data)
+    model_version = model_registry.active_version
+    label = await result_cache.get(digest, model_version)
+    if label is not None:
+        logger.info(f"Inference cache hit for {url} ({digest[:12]})")
+        return label
+    pixels = await asyncio.to_thread(decode_image, data)
+    label = await ai_batcher.submit(pixels)
+    await result_cache.put(digest, model_version, label, size_bytes=len(data))
+    return label
+
+
+async def fail_upload(result_tx_hash, reason):
+    """Mark the job behind a reverted AI_solution failed; a revert is deterministic, so resending only pays for another"""
+    # Clearing the owner also stops a worker still notifying for this job from marking it done
+    failed = await ImageJob.objects.filter(result_tx_hash=result_tx_hash).aupdate(
+        status=ImageJob.STATUS_FAILED, lease_owner="", lease_expires_at=None, last_error=reason,
+        updated_at=timezone.now(),
+    )
+    logger.error(f"AI_solution {result_tx_hash} reverted: {failed} jobs failed")
+
+
+async def requeue_upload(result_tx_hash, reason):
+    """Send the job behind a dropped AI_solution back to the upload stage"""
+    now = timezone.now()
+    jobs = ImageJob.objects.filter(result_tx_hash=result_tx_hash)
+    failed = await jobs.filter(attempts__gte=JOB_MAX_ATTEMPTS).aupdate(
+        status=ImageJob.STATUS_FAILED, lease_owner="", lease_expires_at=None, last_error=reason, updated_at=now,
+    )
+    retried = await jobs.filter(attempts__lt=JOB_MAX_ATTEMPTS).aupdate(
+        status=ImageJob.STATUS_PENDING, stage=ImageJob.STAGE_UPLOAD, result_tx_hash="", last_error=reason,
+        lease_owner="", lease_expires_at=now + timedelta(seconds=JOB_RETRY_DELAY), updated_at=now,
+    )
+    logger.warning(f"AI_solution {result_tx_hash} dropped: {retried} jobs queued for re-upload, {failed} failed")
+
+
+async def transaction_dropped(w3, tx_hash):
+    """True once a transaction can never be mined: the node no longer knows it, or its nonce went to another"""
+    try:
+        tx = await w3.eth.get_transaction(tx_hash)
+    except TransactionNotFound:
+        return True
+    if tx.get("blockNumber") is not None:
+        return False
+    return await w3.eth.get_transaction_count(tx["from"], "latest") > tx["nonce"]
+
+
+async def check_timed_out(tx_hash, reason):
+    """Re-upload a timed-out AI_solution only once it is really gone, otherwise keep watching it"""
+    tx_hash_hex = '0x' + tx_hash.hex()
+    try:
+        dropped = await transaction_dropped(receipt_tracker.w3, tx_hash)
+    except Exception as e:
+        logger.warning(f"Could not check AI_solution {tx_hash_hex}: {e}")
+        dropped = False
+    if not dropped:
+        # Still in the mempool (or unknown for now); resending could get both mined
+        logger.info(f"AI_solution {tx_hash_hex} may still be mined, watching it again")
+        receipt_tracker.track(tx_hash, on_receipt)
+        return
+    # The local nonce counter skipped past a nonce that was never used
+    await asyncio.to_thread(submitter.nonces.resync)
+    await requeue_upload(tx_hash_hex, reason)
+
+
+def on_receipt(tx_hash, tx_receipt, error):
+    """Receipt tracker callback: log the outcome, fail reverted uploads and redo dropped ones"""
+    handle_receipt(tx_hash, tx_receipt, error)
+    if error is not None:
+        task = asyncio.create_task(check_timed_out(tx_hash, str(error)))
+    elif tx_receipt.status == 1:
+        # The reviewed image has left the contract's pending list
+        task = asyncio.create_task(pending_images_cache.ainvalidate())
+    else:
+        task = asyncio.create_task(fail_upload('0x' + tx_hash.hex(), "AI_solution transaction reverted"))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def process_image(task: ImageTask):
+    """Run AI, upload the result and notify the farmer for a single image"""
+    try:
+        await _process_image(task)
+    finally:
+        if task.position is not None:
+            checkpoint.task_done(task.position)
+
+
+async def _process_image(task: ImageTask):
+    # The job may have waited in the queue past its lease; renew it before doing any work
+    try:
+        await _renew_lease(task)
+    except LeaseLost as e:
+        logger.info(f"Skipping queued copy of job {task.job_id}: {e}")
+        return
+    job = await ImageJob.objects.aget(id=task.job_id)
+    try:
+        # Each stage is recorded so a retried job resumes where it stopped
+        if job.stage == ImageJob.STAGE_AI:
+            logger.info(f"Running AI on image: {job.image_url}")
+            try:
+                result = format_result(job.image_url, await classify_image(job.image_url))
+            except ImageFetchError as e:
+                # Retrying will not make a bad or oversized upload usable
+                logger.error(f"Rejected image {job.image_url}: {e}")
+                result = f"AI Review: {job.image_url} - Error occurred during analysis"
+            logger.info(f"AI Result: {result}")
+            await _save_stage(job, task, ai_result=result, stage=ImageJob.STAGE_UPLOAD)
+
+        if job.stage == ImageJob.STAGE_UPLOAD:
+            # Confirm ownership and extend the lease right before spending gas, so no other claim can upload too
+            await _renew_lease(task)
+            tx_hash = await asyncio.to_thread(uploadResult, job.image_url, job.ai_result)
+            if tx_hash is None:
+                raise RuntimeError("AI_solution upload failed")
+            await _save_stage(job, task, result_tx_hash='0x' + tx_hash.hex(), stage=ImageJob.STAGE_NOTIFY)
+            # Tracked after the hash is saved so a failed receipt can find its job
+            receipt_tracker.track(tx_hash, on_receipt)
+
+        if job.stage == ImageJob.STAGE_NOTIFY:
+            # farmer_map is effectively immutable per address, so repeat lookups hit the cache
+            aadharId = await asyncio.to_thread(farmer_cache.get_aadhar, job.user)
+            logger.info(f"Farmer Aadhar ID: {aadharId} (cache {farmer_cache.stats()})")
+            notifier.add(aadharId, job.image_url)
+
+        await sync_to_async(ImageJob.objects.release)(
+            job.id, WORKER_ID, status=ImageJob.STATUS_DONE, stage=ImageJob.STAGE_DONE, last_error=""
+        )
+    except LeaseLost as e:
+        logger.warning(f"Stopped job {job.id} at stage {job.stage}: {e}")
+    except Exception as e:
+        logger.error(f"Job {job.id} failed at stage {job.stage} (attempt {job.attempts}): {e}", exc_info=True)
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            await sync_to_async(ImageJob.objects.release)(
+                job.id, WORKER_ID, status=ImageJob.STATUS_FAILED, last_error=str(e)
+            )
+        else:
+            # Keep the lease until the retry delay passes so the job is not picked up straight away
+            await sync_to_async(ImageJob.objects.release)(
+                job.id, WORKER_ID, status=ImageJob.STATUS_PENDING, last_error=str(e),
+                lease_expires_at=timezone.now() + timedelta(seconds=JOB_RETRY_DELAY),
+            )
+
+
+# Shared queue: subscription callbacks only decode and enqueue, workers do the rest.
+# Reputable farmers are served first and farmers take turns within a class.
+image_queue = JobQueue(
+    process_image,
+    workers=PIPELINE_WORKERS,
+    maxsize=PIPELINE_QUEUE_SIZE,
+    name="image",
+    key=lambda task: task.user,
+    priority=lambda task: task.priority,
+    weights=PRIORITY_WEIGHTS,
+)
+
+
+async def recover_jobs():
+    """Periodically claim pending or expired jobs left behind by crashed or busy workers"""
+    while True:
+        try:
+            free = image_queue.maxsize - image_queue.qsize() if image_queue.maxsize else JOB_CLAIM_BATCH
+            if free > 0:
+                jobs = await sync_to_async(claim_jobs)(min(free, JOB_CLAIM_BATCH))
+                for job in jobs:
+                    logger.info(f"Recovered job {job.id} for {job.image_url} at stage {job.stage}")
+                    await _queue_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job recovery failed: {e}")
+        await asyncio.sleep(JOB_RECOVERY_INTERVAL)
+
+
+async def start_pipeline():
+    """Start the image workers and background helpers on the running loop"""
+    await checkpoint.load()
+    await image_queue.start()
+    await receipt_tracker.start()
+    asyncio.create_task(recover_jobs(), name="job-recovery")
+    # The listener is long-lived, so it also resends notification jobs left queued by restarted web workers
+    dispatcher.start()
+    if FARMER_CACHE_WARM_UP:
+        asyncio.create_task(asyncio.to_thread(farmer_cache.warm_up))
+
+
+async def enqueue_images(user, image_urls, tx_hash, position=None):
+    """Record a `$$$`-joined ImageSubmitted payload as durable jobs and queue the ones claimed here"""
+    if position is not None and checkpoint.seen(position):
+        logger.info(f"Skipping already processed event at block {position[0]}, log {position[1]}")
+        return
+    urls = image_urls.split("$$$")
+    jobs = await sync_to_async(record_jobs)(user, urls, tx_hash, position)
+    # A new submission changes the contract's pending list
+    await pending_images_cache.ainvalidate()
+    if position is not None and not checkpoint.begin(position, len(jobs)):
+        return
+    for job in jobs:
+        await _queue_job(job, position)
+    logger.info(f"Queued {len(jobs)} of {len(urls)} images ({image_queue.qsize()} waiting)")
+
+
+async def handle_event(event):
+    logger.info("New ImageSubmitted Event:")
+    logger.info(f"User: {event.user}")
+    logger.info(f"URL: {event.image_url}")
+    logger.info(f"Transaction Hash: {event.tx_hash}")
+    await enqueue_images(event.user, event.image_url, event.tx_hash, event.position)
+
+
+async def handle_log(log):
+    """Decode an ImageSubmitted log from a subscription and queue its images"""
+    await handle_event(decode_log(log))
+
+
+async def handle_logs(logs):
+    """Decode a batch of polled or backfilled logs and queue their images in chain order.
+
+    A failed event stops the batch and propagates, so the caller retries the
+    range instead of marking it scanned; events already queued are skipped on replay.
+    """
+    for event in decode_logs(logs):
+        try:
+            await handle_event(event)
+        except Exception as e:
+            logger.error(f"Error handling ImageSubmitted event {event.tx_hash}: {e}", exc_info=True)
+            raise
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+class ReceiptTracker:
+    """Single background watcher that resolves outstanding transaction receipts once per new block"""
+
+    def __init__(self, w3, poll_interval=2.0, timeout_blocks=50, batch_size=50):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout_blocks = timeout_blocks
+        self.batch_size = batch_size
+        # tx hash -> [future, callbacks, block first seen]
+        self._pending = {}
+        self._last_block = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def pending_count(self):
+        return len(self._pending)
+
+    async def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="receipt-tracker")
+            logger.info("Receipt tracker started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            logger.info("Receipt tracker stopped")
+
+    def track(self, tx_hash, callback=None):
+        """Watch a transaction and return a future resolved with its receipt.
+
+        ``callback(tx_hash, receipt, error)`` is also called once the receipt
+        arrives or the transaction times out.
+        """
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="receipt-tracker")
+        entry = self._pending.get(tx_hash)
+        if entry is None:
+            entry = [asyncio.get_running_loop().create_future(), [], self._last_block]
+            self._pending[tx_hash] = entry
+        if callback is not None:
+            entry[1].append(callback)
+        return entry[0]
+
+    async def _run(self):
+        while True:
+            try:
+                block_number = await self.w3.eth.block_number
+                if block_number != self._last_block:
+                    self._last_block = block_number
+                    if self._pending:
+                        await self._poll(block_number)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Receipt tracker poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _fetch_receipt(self, tx_hash):
+        try:
+            return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def _poll(self, block_number):
+        hashes = list(self._pending)
+        for start in range(0, len(hashes), self.batch_size):
+            batch = hashes[start:start + self.batch_size]
+            receipts = await asyncio.gather(
+                *(self._fetch_receipt(tx_hash) for tx_hash in batch),
+                return_exceptions=True,
+            )
+            for tx_hash, receipt in zip(batch, receipts):
+                if isinstance(receipt, Exception):
+                    logger.warning(f"Could not fetch receipt for {tx_hash.hex()}: {receipt}")
+                elif receipt is not None:
+                    self._resolve(tx_hash, receipt, None)
+                else:
+                    first_seen = self._pending[tx_hash][2]
+                    if first_seen is None:
+                        self._pending[tx_hash][2] = block_number
+                    elif block_number - first_seen >= self.timeout_blocks:
+                        error = TimeExhausted(
+                            f"Transaction {tx_hash.hex()} is not in the chain after {self.timeout_blocks} blocks"
+                        )
+                        self._resolve(tx_hash, None, error)
+        logger.debug(f"Block {block_number}: {len(self._pending)} transactions still pending")
+
+    def _resolve(self, tx_hash, receipt, error):
+        future, callbacks, _ = self._pending.pop(tx_hash)
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+                # Nobody may await the future when callbacks are used
+                future.exception()
+            else:
+                future.set_result(receipt)
+        for callback in callbacks:
+            try:
+                callback(tx_hash, receipt, error)
+            except Exception as e:
+                logger.error(f"Receipt callback failed for {tx_hash.hex()}: {e}", exc_info=True)
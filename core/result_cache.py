@@ -0,0 +1,67 @@
+import hashlib
+import logging
+import os
+from django.db.models import F
+from django.utils import timezone
+from .models import InferenceResult
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Rows hold only a short label, so the row count is what bounds the table's size
+AI_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('AI_RESULT_CACHE_MAX_ENTRIES', '100000'))
+# Run eviction once every this many inserts instead of on each one
+AI_RESULT_CACHE_EVICT_EVERY = int(os.getenv('AI_RESULT_CACHE_EVICT_EVERY', '500'))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """Inference results keyed by (image content hash, model version), evicted least recently used first"""
+
+    def __init__(self, max_entries=AI_RESULT_CACHE_MAX_ENTRIES, evict_every=AI_RESULT_CACHE_EVICT_EVERY):
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+
+    async def get(self, digest, model_version):
+        entry = await InferenceResult.objects.filter(
+            content_hash=digest, model_version=model_version
+        ).only("id", "label").afirst()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        await InferenceResult.objects.filter(id=entry.id).aupdate(
+            hits=F("hits") + 1, last_used_at=timezone.now()
+        )
+        return entry.label
+
+    async def put(self, digest, model_version, label, size_bytes=0):
+        await InferenceResult.objects.aupdate_or_create(
+            content_hash=digest,
+            model_version=model_version,
+            defaults={"label": label, "size_bytes": size_bytes, "last_used_at": timezone.now()},
+        )
+        self._inserts += 1
+        if self._inserts % self.evict_every == 0:
+            await self.evict()
+
+    async def evict(self):
+        """Trim the table back to max_entries, dropping the least recently used results"""
+        excess = await InferenceResult.objects.acount() - self.max_entries
+        if excess <= 0:
+            return 0
+        cutoff = await InferenceResult.objects.order_by("last_used_at", "id").values_list(
+            "last_used_at", flat=True
+        )[excess - 1:].afirst()
+        deleted, _ = await InferenceResult.objects.filter(last_used_at__lte=cutoff).adelete()
+        logger.info(f"Evicted {deleted} cached inference results")
+        return deleted
+
+
+result_cache = ResultCache()
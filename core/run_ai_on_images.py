@@ -1,4 +1,7 @@
 import logging
+import os
+import numpy as np
+from .model_registry import model_registry
 
 
 
@@ -6,18 +9,28 @@ import logging
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
-def run_ai_on_image(url):
-    """Run AI analysis on image with proper logging"""
-    try:
-        logger.info(f"Starting AI analysis for image: {url}")
-        
-        
-        # For now, return a mock result
-        result = "AI Review:" + url + " is Safe"
-        logger.info(f"AI analysis completed: {result}")
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error running AI analysis on image {url}: {e}", exc_info=True)
-        return f"AI Review: {url} - Error occurred during analysis"
+# Model input geometry and normalisation
+AI_INPUT_SIZE = int(os.getenv('AI_INPUT_SIZE', '224'))
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+def preprocess_batch(images):
+    """Stack uint8 images into one normalised float32 (N, 3, H, W) batch"""
+    batch = np.stack(images).astype(np.float32)
+    batch /= 255.0
+    batch -= MEAN
+    batch /= STD
+    return batch.transpose(0, 3, 1, 2)
+
+
+def run_ai_on_batch(images, model_version=None):
+    """Run AI analysis on a batch of decoded images with a single model call"""
+    model = model_registry.get(model_version)
+    logger.info(f"Starting AI analysis for a batch of {len(images)} images with model {model.version}")
+    labels = model.predict(preprocess_batch(images))
+    logger.info(f"AI analysis completed for {len(images)} images")
+    return labels
+
+
+def format_result(url, label):
+    return "AI Review:" + url + " is " + label
@@ -2,10 +2,9 @@ import logging
 import os
 from pathlib import Path
 from web3 import Web3
-from fcm.models import FCMToken
+from fcm.dispatcher import dispatcher
 import firebase_admin
-from firebase_admin import credentials, messaging
-from asgiref.sync import sync_to_async
+from firebase_admin import credentials
 from dotenv import load_dotenv
 from CropChain.settings import BASE_DIR
 
@@ -62,55 +61,9 @@ async def sendNotification(aadharId, title="Sujal's Notification", body="Kaise h
         # aadharId = farmer_info[1]
         # logger.info(f"Farmer Aadhar ID: {aadharId}")
         
-        # Get all FCM tokens for the given aadhar ID - use sync_to_async for database operations
-        logger.info(f"Searching for FCM tokens for Aadhar ID: {aadharId}")
-        fcm_tokens = await sync_to_async(FCMToken.objects.filter)(aadhaar_number=str(aadharId))
-        tokens = await sync_to_async(lambda: [token.token for token in fcm_tokens])()
-        
-        # If no tokens found, return early
-        if not tokens:
-            logger.warning(f"No FCM tokens found for aadhar ID: {aadharId}")
-            return False
-        
-        logger.info(f"Found {len(tokens)} FCM tokens for user")
-        
-        # Prepare notification data
-        if data is None:
-            data = {}
-        
-        # Create the multicast message
-        logger.info("Creating notification message...")
-        message = messaging.MulticastMessage(
-            notification=messaging.Notification(
-                title=title,
-                body=body
-            ),
-            data=data,
-            tokens=tokens,
-        )
-        
-        # Send the notification
-        logger.info("Sending notification to Firebase...")
-        response = messaging.send_each_for_multicast(message)
-        
-        # Handle failures
-        if response.failure_count > 0:
-            responses = response.responses
-            failed_tokens = []
-            for idx, resp in enumerate(responses):
-                if not resp.success:
-                    # The order of responses corresponds to the order of the registration tokens.
-                    failed_tokens.append(tokens[idx])
-            logger.warning(f"List of tokens that caused failures: {failed_tokens}")
-            
-            # Optionally remove failed tokens from database - use sync_to_async
-            logger.info("Cleaning up failed tokens from database...")
-            for failed_token in failed_tokens:
-                await sync_to_async(FCMToken.objects.filter(token=failed_token).delete)()
-            logger.info(f"Removed {len(failed_tokens)} failed tokens from database")
-        
-        logger.info(f"Successfully sent messages: {response.success_count}")
-        logger.info(f"Failed to send messages: {response.failure_count}")
+        # Hand off to the dispatcher: tokens are resolved and sent in FCM batches off this loop
+        logger.info(f"Queueing notification for Aadhar ID: {aadharId}")
+        dispatcher.submit(aadharId, title=title, body=body, data=data)
         
         return True
         
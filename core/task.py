@@ -2,15 +2,14 @@ import asyncio
 import logging
 import os
 from pathlib import Path
-from .run_ai_on_images import run_ai_on_image
-from .upload_result import uploadResult
-from web3 import AsyncWeb3, WebSocketProvider, HTTPProvider
+from .pipeline import handle_log, handle_logs, start_pipeline, IMAGE_SUBMITTED_TOPIC
+from .log_poller import LogPoller
+from .inference_executor import inference_executor
+from .web3_client import get_async_web3
+from web3 import AsyncWeb3, WebSocketProvider
 from web3.utils.subscriptions import LogsSubscription, LogsSubscriptionContext
-from web3._utils.events import get_event_data
-from .send_notification import sendNotification
 from dotenv import load_dotenv
 from CropChain.settings import BASE_DIR
-from web3 import Web3
 
 load_dotenv(os.path.join(BASE_DIR, '.env'))
 
@@ -26,6 +25,7 @@ abi = os.getenv('ABI')
 PROVIDERS = {
     "wss_provider_1": os.getenv('WSS_PROVIDER_1'),
     "wss_provider_2":os.getenv('WSS_PROVIDER_2'),
+    "http_provider_1": os.getenv('HTTP_PROVIDER_1'),
 }
 
 async def test_provider(provider_url, is_websocket=True):
@@ -34,7 +34,7 @@ async def test_provider(provider_url, is_websocket=True):
         if is_websocket:
             w3 = await AsyncWeb3(WebSocketProvider(provider_url))
         else:
-            w3 = AsyncWeb3(HTTPProvider(provider_url))
+            w3 = get_async_web3(provider_url)
         
         # Test basic connectivity
         block_number = await w3.eth.block_number
@@ -46,41 +46,7 @@ async def test_provider(provider_url, is_websocket=True):
 
 async def log_handler(handler_context: LogsSubscriptionContext) -> None:
     try:
-        log = handler_context.result
-        event_abi = {
-        "anonymous":False,"inputs":[{"indexed":False,"internalType":"address","name":"_user","type":"address"},{"indexed":False,"internalType":"string","name":"imageUrl","type":"string"}],"name":"ImageSubmitted","type":"event"
-        }
-        w3 = handler_context.async_w3
-        decoded = get_event_data(w3.codec, event_abi, log)
-        urls = decoded["args"]["imageUrl"].split("$$$")
-        logger.info("New ImageSubmitted Event:")
-        logger.info(f"User: {decoded['args']['_user']}")
-        logger.info(f"URL: {decoded['args']['imageUrl']}")
-        logger.info(f"Transaction Hash: {log['transactionHash'].hex() if hasattr(log['transactionHash'], 'hex') else log['transactionHash']}")
-        user = decoded["args"]["_user"]
-        for url in urls:
-            logger.info(f"Running AI on image: {url}")
-            result = run_ai_on_image(url)
-            logger.info(f"AI Result: {result}")
-            uploadResult(url,result)
-            web3 = Web3(Web3.HTTPProvider(os.getenv('HTTP_PROVIDER_1')))
-            if not web3.is_connected():
-                logger.error("Failed to connect to Ethereum network")
-                return False
-            
-            logger.info("Connected to Ethereum network")
-        
-            # Get contract instance
-            contract = web3.eth.contract(address=CONTRACT_ADDRESS, abi=abi)
-            logger.info(f"Contract loaded at address: {CONTRACT_ADDRESS}")
-        
-            # Get farmer info from blockchain
-            logger.info("Fetching farmer information from blockchain...")
-            farmer_info = contract.functions.farmer_map(user).call()
-            aadharId = farmer_info[1]
-            logger.info(f"Farmer Aadhar ID: {aadharId}")
-
-            await sendNotification(aadharId)
+        await handle_log(handler_context.result)
     except Exception as e:
         logger.error(f"Error in log_handler: {e}", exc_info=True)
 
@@ -114,6 +80,7 @@ async def sub_manager():
         raise Exception("No working providers found. Please check your API keys and network connection.")
     
     logger.info(f"Using provider: {working_provider}")
+    await start_pipeline()
     
     for attempt in range(max_retries):
         try:
@@ -123,7 +90,7 @@ async def sub_manager():
             if "ws" in working_provider:
                 w3 = await AsyncWeb3(WebSocketProvider(working_provider))
             else:
-                w3 = await AsyncWeb3(HTTPProvider(working_provider))
+                w3 = get_async_web3(working_provider)
             
             logger.info("Successfully connected")
             
@@ -133,7 +100,7 @@ async def sub_manager():
                     LogsSubscription(
                         label="ImageSubmitted (address _user, string imageUrl)",
                         address=w3.to_checksum_address(CONTRACT_ADDRESS),
-                        topics=[["0x2176ff554abc6afb8a3baf0448d7ff22c25829c4aee3806c623ed36edb2b2bba"]],
+                        topics=[[IMAGE_SUBMITTED_TOPIC]],
                         handler=log_handler,
                     )
                 ])
@@ -141,10 +108,14 @@ async def sub_manager():
                 logger.info("Subscribed to blockchain events. Waiting for ImageSubmitted events...")
                 await w3.subscription_manager.handle_subscriptions()
             else:
-                logger.warning("Using HTTP provider - real-time events not available")
-                logger.info("Consider setting up WebSocket provider for real-time event listening")
-                # You could implement polling here instead
-                await asyncio.sleep(60)  # Sleep for 1 minute
+                logger.warning("Using HTTP provider - polling eth_getLogs for ImageSubmitted events")
+                poller = LogPoller(
+                    w3,
+                    address=w3.to_checksum_address(CONTRACT_ADDRESS),
+                    topics=[IMAGE_SUBMITTED_TOPIC],
+                    handler=handle_logs,
+                )
+                await poller.run()
                 
         except Exception as e:
             logger.error(f"Connection attempt {attempt + 1} failed: {e}")
@@ -165,5 +136,7 @@ def start():
         logger.info("Background worker stopped by user")
     except Exception as e:
         logger.error(f"Background worker failed: {e}", exc_info=True)
+    finally:
+        inference_executor.shutdown(wait=False)
     
     
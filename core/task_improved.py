@@ -2,12 +2,13 @@ import asyncio
 import logging
 import signal
 from typing import Optional
-from .run_ai_on_images import run_ai_on_image
-from .upload_result import uploadResult
-from web3 import AsyncWeb3, WebSocketProvider, HTTPProvider
+from .pipeline import handle_log, handle_logs, start_pipeline, checkpoint, IMAGE_SUBMITTED_TOPIC
+from .backfill import backfill
+from .inference_executor import inference_executor
+from .log_poller import LogPoller
+from .web3_client import get_async_web3
+from web3 import AsyncWeb3, WebSocketProvider, AsyncHTTPProvider
 from web3.utils.subscriptions import LogsSubscription, LogsSubscriptionContext
-from web3._utils.events import get_event_data
-from .send_notification import sendNotification
 import os
 from dotenv import load_dotenv
 from CropChain.settings import BASE_DIR
@@ -25,8 +26,12 @@ CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS')
 PROVIDERS = {
     "wss_provider_1": os.getenv('WSS_PROVIDER_1'),
     "wss_provider_2":os.getenv('WSS_PROVIDER_2'),
+    "http_provider_1": os.getenv('HTTP_PROVIDER_1'),
 }
 
+# Block to start catching up from when no checkpoint has been saved yet
+BACKFILL_START_BLOCK = int(os.getenv('BACKFILL_START_BLOCK')) if os.getenv('BACKFILL_START_BLOCK') else None
+
 # Global variables for graceful shutdown
 shutdown_event = asyncio.Event()
 w3_instance: Optional[AsyncWeb3] = None
@@ -50,7 +55,7 @@ async def test_provider(provider_url, is_websocket=True):
                 timeout=30.0
             )
         else:
-            w3 = AsyncWeb3(HTTPProvider(provider_url))
+            w3 = get_async_web3(provider_url)
         
         # Test basic connectivity with timeout
         block_number = await asyncio.wait_for(
@@ -68,24 +73,7 @@ async def test_provider(provider_url, is_websocket=True):
 
 async def log_handler(handler_context: LogsSubscriptionContext) -> None:
     try:
-        log = handler_context.result
-        event_abi = {
-        "anonymous":False,"inputs":[{"indexed":False,"internalType":"address","name":"_user","type":"address"},{"indexed":False,"internalType":"string","name":"imageUrl","type":"string"}],"name":"ImageSubmitted","type":"event"
-        }
-        w3 = handler_context.async_w3
-        decoded = get_event_data(w3.codec, event_abi, log)
-        urls = decoded["args"]["imageUrl"].split("$$$")
-        logger.info("New ImageSubmitted Event:")
-        logger.info(f"user: {decoded['args']['_user']}")
-        logger.info(f"url: {decoded['args']['imageUrl']}")
-        logger.info(f"transactionHash: {log['transactionHash'].hex() if hasattr(log['transactionHash'], 'hex') else log['transactionHash']}")
-        user = decoded["args"]["_user"]
-        for url in urls:
-            logger.info(f"Running AI on image: {url}")
-            result = run_ai_on_image(url)
-            logger.info(f"AI result: {result}")
-            uploadResult(url, result)
-            await sendNotification(user)
+        await handle_log(handler_context.result)
     except Exception as e:
         logger.error(f"Error in log_handler: {e}", exc_info=True)
 
@@ -139,9 +127,30 @@ async def find_working_provider():
         logger.error("No working providers found. Retrying in 60 seconds...")
         await asyncio.sleep(60)
 
+async def catch_up(w3: AsyncWeb3):
+    """Replay ImageSubmitted events emitted since the last checkpoint"""
+    from_block = checkpoint.next_block()
+    if from_block is None:
+        from_block = BACKFILL_START_BLOCK
+    if from_block is None:
+        logger.info("No checkpoint saved yet, starting from the latest block")
+        return
+    latest = await w3.eth.block_number
+    await backfill(
+        w3,
+        address=w3.to_checksum_address(CONTRACT_ADDRESS),
+        topics=[IMAGE_SUBMITTED_TOPIC],
+        from_block=from_block,
+        to_block=latest,
+        handler=handle_logs,
+    )
+    # Quiet ranges count as processed too, so the next catch-up starts after them
+    checkpoint.scanned(latest)
+
 async def sub_manager():
     """Main subscription manager with infinite retry logic and better error handling"""
     global w3_instance
+    await start_pipeline()
     
     while not shutdown_event.is_set():
         try:
@@ -160,7 +169,7 @@ async def sub_manager():
                         timeout=30.0
                     )
                 else:
-                    w3_instance = AsyncWeb3(HTTPProvider(working_provider))
+                    w3_instance = AsyncWeb3(AsyncHTTPProvider(working_provider))
                 
                 logger.info("Successfully connected")
             except asyncio.TimeoutError:
@@ -182,11 +191,14 @@ async def sub_manager():
                         LogsSubscription(
                             label="ImageSubmitted (address _user, string imageUrl)",
                             address=w3_instance.to_checksum_address(CONTRACT_ADDRESS),
-                            topics=[["0x2176ff554abc6afb8a3baf0448d7ff22c25829c4aee3806c623ed36edb2b2bba"]],
+                            topics=[[IMAGE_SUBMITTED_TOPIC]],
                             handler=log_handler,
                         )
                     ])
 
+                    # Subscribe first so nothing is missed, then replay the gap; duplicates are skipped by the checkpoint
+                    await catch_up(get_async_web3())
+
                     logger.info("Subscribed to blockchain events. Waiting for ImageSubmitted events...")
                     
                     # Wait for either shutdown or subscription to end with timeout handling
@@ -211,11 +223,17 @@ async def sub_manager():
                         shutdown_event.set()
                         break
             else:
-                logger.warning("Using HTTP provider - real-time events not available")
-                logger.info("Consider setting up WebSocket provider for real-time event listening")
-                # Implement polling here instead
-                while not shutdown_event.is_set():
-                    await asyncio.sleep(60)  # Sleep for 1 minute
+                logger.warning("Using HTTP provider - polling eth_getLogs for ImageSubmitted events")
+                w3 = w3_instance
+                poller = LogPoller(
+                    w3,
+                    address=w3.to_checksum_address(CONTRACT_ADDRESS),
+                    topics=[IMAGE_SUBMITTED_TOPIC],
+                    handler=handle_logs,
+                    from_block=checkpoint.next_block() or BACKFILL_START_BLOCK,
+                    on_scanned=checkpoint.scanned,
+                )
+                await poller.run(shutdown_event)
                     
         except Exception as e:
             logger.error(f"Connection error: {e}", exc_info=True)
@@ -245,6 +263,7 @@ async def graceful_shutdown():
         except Exception as e:
             logger.error(f"Error closing Web3 connection: {e}")
     
+    inference_executor.shutdown(wait=False)
     logger.info("Graceful shutdown completed")
 
 def start():
@@ -1,3 +1,593 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from eth_abi import encode
+from hexbytes import HexBytes
+from PIL import Image
+from web3.exceptions import TransactionNotFound
+from .checkpoint import SCANNED_LOG_INDEX, CheckpointTracker
+from .event_decoder import IMAGE_SUBMITTED_TOPIC, decode_log, decode_logs
+from .farmer_cache import FarmerInfo
+from .image_fetcher import ImageFetchError, ImageFetcher, decode_image
+from .inference_batcher import MicroBatcher
+from .job_queue import FairQueue
+from .log_poller import LogPoller
+from .models import BlockCheckpoint, ImageJob, InferenceResult
+from .notification_coalescer import join_within
+from .pending_cache import PendingImagesCache
+from .pipeline import fail_upload, farmer_priority, handle_logs, requeue_upload, transaction_dropped
+from .result_cache import ResultCache
+from .tx_submitter import NonceManager
 
-# Create your tests here.
+
+class ImageJobLeaseTests(TestCase):
+    def make_job(self, **fields):
+        return ImageJob.objects.create(image_url=f"https://img/{ImageJob.objects.count()}.jpg",
+                                       tx_hash="0xabc", user="0xuser", **fields)
+
+    def test_claim_leases_each_job_once(self):
+        job = self.make_job()
+        claimed = ImageJob.objects.claim("worker-a", limit=5)
+        self.assertEqual([j.id for j in claimed], [job.id])
+        self.assertEqual(claimed[0].status, ImageJob.STATUS_RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(ImageJob.objects.claim("worker-b", limit=5), [])
+
+    def test_expired_lease_can_be_reclaimed(self):
+        job = self.make_job()
+        ImageJob.objects.claim("worker-a")
+        ImageJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        claimed = ImageJob.objects.claim("worker-b")
+        self.assertEqual([(j.id, j.lease_owner, j.attempts) for j in claimed], [(job.id, "worker-b", 2)])
+
+    def test_done_and_delayed_jobs_are_not_claimed(self):
+        self.make_job(status=ImageJob.STATUS_DONE)
+        self.make_job(lease_expires_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(ImageJob.objects.claim("worker-a"), [])
+
+    def test_renew_fails_once_the_job_is_reclaimed(self):
+        job = self.make_job()
+        first = ImageJob.objects.claim("worker-a")[0]
+        self.assertEqual(ImageJob.objects.renew(job.id, "worker-a", first.attempts), 1)
+
+        ImageJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        second = ImageJob.objects.claim("worker-b")[0]
+        self.assertEqual(ImageJob.objects.renew(job.id, "worker-a", first.attempts), 0)
+        self.assertEqual(ImageJob.objects.renew(job.id, "worker-b", second.attempts), 1)
+
+    def test_renew_rejects_a_stale_claim_by_the_same_owner(self):
+        job = self.make_job()
+        first = ImageJob.objects.claim("worker-a")[0]
+        ImageJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        ImageJob.objects.claim("worker-a")
+        self.assertEqual(ImageJob.objects.renew(job.id, "worker-a", first.attempts), 0)
+
+    def test_release_requires_the_lease_owner(self):
+        job = self.make_job()
+        ImageJob.objects.claim("worker-a")
+        self.assertEqual(ImageJob.objects.release(job.id, "worker-b", status=ImageJob.STATUS_DONE), 0)
+        self.assertEqual(ImageJob.objects.release(job.id, "worker-a", status=ImageJob.STATUS_DONE), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.lease_owner, job.lease_expires_at), (ImageJob.STATUS_DONE, "", None))
+
+
+class FakeEth:
+    def __init__(self, count):
+        self.count = count
+        self.calls = 0
+
+    def get_transaction_count(self, address, block_identifier):
+        self.calls += 1
+        return self.count
+
+
+class FakeWeb3:
+    def __init__(self, count):
+        self.eth = FakeEth(count)
+
+
+class NonceManagerTests(SimpleTestCase):
+    def test_allocates_sequentially_after_one_sync(self):
+        w3 = FakeWeb3(7)
+        nonces = NonceManager(w3, "0xsender")
+        self.assertEqual([nonces.allocate() for _ in range(3)], [7, 8, 9])
+        self.assertEqual(w3.eth.calls, 1)
+
+    def test_resync_reloads_the_pending_count(self):
+        w3 = FakeWeb3(7)
+        nonces = NonceManager(w3, "0xsender")
+        nonces.allocate()
+        nonces.allocate()
+        w3.eth.count = 8
+        self.assertEqual(nonces.resync(), 8)
+        self.assertEqual(nonces.allocate(), 8)
+
+
+class FakeAsyncEth:
+    def __init__(self, tx, mined_count=0):
+        self.tx = tx
+        self.mined_count = mined_count
+
+    async def get_transaction(self, tx_hash):
+        if self.tx is None:
+            raise TransactionNotFound("unknown")
+        return self.tx
+
+    async def get_transaction_count(self, address, block_identifier):
+        return self.mined_count
+
+
+class FakeAsyncWeb3:
+    def __init__(self, tx, mined_count=0):
+        self.eth = FakeAsyncEth(tx, mined_count)
+
+
+class ReceiptOutcomeTests(TestCase):
+    async def test_only_unknown_or_replaced_transactions_count_as_dropped(self):
+        pending = {"from": "0xsender", "nonce": 5, "blockNumber": None}
+        self.assertTrue(await transaction_dropped(FakeAsyncWeb3(None), b"h"))
+        self.assertFalse(await transaction_dropped(FakeAsyncWeb3(pending, mined_count=5), b"h"))
+        self.assertTrue(await transaction_dropped(FakeAsyncWeb3(pending, mined_count=6), b"h"))
+        self.assertFalse(await transaction_dropped(FakeAsyncWeb3({**pending, "blockNumber": 9}, mined_count=6), b"h"))
+
+    async def make_uploaded_job(self, attempts):
+        return await ImageJob.objects.acreate(
+            image_url=f"https://img/{attempts}.jpg", tx_hash="0xabc", user="0xuser", attempts=attempts,
+            status=ImageJob.STATUS_RUNNING, stage=ImageJob.STAGE_NOTIFY, lease_owner="worker-a",
+            result_tx_hash=f"0x{attempts}",
+        )
+
+    async def test_reverted_upload_fails_the_job(self):
+        job = await self.make_uploaded_job(1)
+        await fail_upload("0x1", "reverted")
+        await job.arefresh_from_db()
+        self.assertEqual((job.status, job.lease_owner), (ImageJob.STATUS_FAILED, ""))
+
+    async def test_dropped_upload_is_retried_until_attempts_run_out(self):
+        retried = await self.make_uploaded_job(1)
+        exhausted = await self.make_uploaded_job(5)
+        await requeue_upload("0x1", "dropped")
+        await requeue_upload("0x5", "dropped")
+        await retried.arefresh_from_db()
+        await exhausted.arefresh_from_db()
+        self.assertEqual((retried.status, retried.stage, retried.result_tx_hash),
+                         (ImageJob.STATUS_PENDING, ImageJob.STAGE_UPLOAD, ""))
+        self.assertEqual(exhausted.status, ImageJob.STATUS_FAILED)
+
+
+class FakeLogsEth:
+    def __init__(self, latest, logs=(), max_span=None):
+        self.latest = latest
+        self.logs = list(logs)
+        self.max_span = max_span
+        self.requests = []
+
+    @property
+    async def block_number(self):
+        return self.latest
+
+    async def get_logs(self, params):
+        self.requests.append((params["fromBlock"], params["toBlock"]))
+        if self.max_span is not None and params["toBlock"] - params["fromBlock"] + 1 > self.max_span:
+            raise ValueError("block range too large")
+        return [log for log in self.logs if params["fromBlock"] <= log <= params["toBlock"]]
+
+
+class LogPollerTests(SimpleTestCase):
+    def make_poller(self, eth, **kwargs):
+        self.batches = []
+        self.scanned = []
+
+        async def handler(logs):
+            self.batches.append(logs)
+
+        w3 = mock.Mock(eth=eth)
+        return LogPoller(w3, "0xcontract", ["0xtopic"], handler, on_scanned=self.scanned.append, **kwargs)
+
+    async def test_shrinks_the_range_when_the_provider_rejects_it(self):
+        eth = FakeLogsEth(latest=1000, max_span=25)
+        poller = self.make_poller(eth, from_block=0, initial_range=100, min_range=10)
+        self.assertFalse(await poller.poll_once())
+        self.assertEqual(poller.block_range, 50)
+        self.assertFalse(await poller.poll_once())
+        self.assertFalse(await poller.poll_once())
+        self.assertEqual(eth.requests[-1], (0, 24))
+        self.assertEqual(poller.next_block, 25)
+
+    async def test_grows_on_quiet_ranges_and_reports_each_scan(self):
+        eth = FakeLogsEth(latest=1000, logs=[3, 5])
+        poller = self.make_poller(eth, from_block=0, initial_range=10, max_range=40, target_logs=12)
+        await poller.poll_once()
+        await poller.poll_once()
+        self.assertEqual(eth.requests, [(0, 9), (10, 29)])
+        self.assertEqual(poller.block_range, 40)
+        self.assertEqual(self.batches, [[3, 5]])
+        self.assertEqual(self.scanned, [9, 29])
+
+    async def test_shrinks_when_a_range_returns_too_many_logs(self):
+        eth = FakeLogsEth(latest=1000, logs=range(10))
+        poller = self.make_poller(eth, from_block=0, initial_range=20, target_logs=5)
+        await poller.poll_once()
+        self.assertEqual(poller.block_range, 10)
+
+    async def test_failed_handler_leaves_the_range_unscanned(self):
+        eth = FakeLogsEth(latest=1000, logs=[3])
+
+        async def handler(logs):
+            raise RuntimeError("database unavailable")
+
+        poller = LogPoller(mock.Mock(eth=eth), "0xcontract", ["0xtopic"], handler, from_block=0,
+                           initial_range=10, on_scanned=self.fail)
+        with self.assertRaises(RuntimeError):
+            await poller.poll_once()
+        self.assertEqual(poller.next_block, 0)
+
+    async def test_reports_caught_up_at_the_head(self):
+        eth = FakeLogsEth(latest=15)
+        poller = self.make_poller(eth, from_block=10, initial_range=100)
+        self.assertTrue(await poller.poll_once())
+        self.assertEqual(eth.requests, [(10, 15)])
+        self.assertTrue(await poller.poll_once())
+        self.assertEqual(len(eth.requests), 1)
+
+
+class CheckpointTrackerTests(TestCase):
+    async def settle(self, tracker):
+        if tracker._save_task is not None:
+            await tracker._save_task
+
+    async def test_advances_only_past_contiguous_finished_positions(self):
+        tracker = CheckpointTracker("test")
+        for position in [(10, 0), (10, 1), (11, 0)]:
+            self.assertTrue(tracker.begin(position))
+        tracker.task_done((11, 0))
+        tracker.task_done((10, 1))
+        self.assertIsNone(tracker.position)
+        tracker.task_done((10, 0))
+        self.assertEqual(tracker.position, (11, 0))
+        await self.settle(tracker)
+        saved = await BlockCheckpoint.objects.aget(name="test")
+        self.assertEqual((saved.block_number, saved.log_index), (11, 0))
+
+    async def test_waits_for_every_task_of_a_position(self):
+        tracker = CheckpointTracker("test")
+        tracker.begin((5, 0), count=2)
+        tracker.task_done((5, 0))
+        self.assertIsNone(tracker.position)
+        tracker.task_done((5, 0))
+        self.assertEqual(tracker.position, (5, 0))
+        await self.settle(tracker)
+
+    async def test_seen_positions_are_not_begun_twice(self):
+        tracker = CheckpointTracker("test")
+        self.assertTrue(tracker.begin((5, 0)))
+        self.assertFalse(tracker.begin((5, 0)))
+        tracker.task_done((5, 0))
+        self.assertFalse(tracker.begin((4, 3)))
+        await self.settle(tracker)
+
+    async def test_empty_log_finishes_immediately(self):
+        tracker = CheckpointTracker("test")
+        self.assertTrue(tracker.begin((7, 2), count=0))
+        self.assertEqual(tracker.position, (7, 2))
+        await self.settle(tracker)
+
+    async def test_scanned_range_moves_past_quiet_blocks(self):
+        tracker = CheckpointTracker("test")
+        tracker.scanned(100)
+        self.assertEqual(tracker.position, (100, SCANNED_LOG_INDEX))
+        self.assertEqual(tracker.next_block(), 101)
+        self.assertTrue(tracker.seen((100, 4)))
+        await self.settle(tracker)
+        saved = await BlockCheckpoint.objects.aget(name="test")
+        self.assertEqual(saved.block_number, 100)
+
+    async def test_scanned_range_waits_for_pending_jobs_below_it(self):
+        tracker = CheckpointTracker("test")
+        tracker.begin((50, 1))
+        tracker.scanned(100)
+        self.assertIsNone(tracker.position)
+        tracker.task_done((50, 1))
+        self.assertEqual(tracker.position, (100, SCANNED_LOG_INDEX))
+        await self.settle(tracker)
+
+    async def test_scanned_range_ignores_pending_jobs_above_it(self):
+        tracker = CheckpointTracker("test")
+        tracker.begin((120, 0))
+        tracker.scanned(100)
+        self.assertEqual(tracker.position, (100, SCANNED_LOG_INDEX))
+        self.assertEqual(tracker.next_block(), 101)
+        await self.settle(tracker)
+
+    async def test_load_restores_saved_position(self):
+        await BlockCheckpoint.objects.acreate(name="test", block_number=42, log_index=3)
+        tracker = CheckpointTracker("test")
+        self.assertEqual(await tracker.load(), (42, 3))
+        self.assertEqual(tracker.next_block(), 42)
+
+
+class HandleLogsTests(SimpleTestCase):
+    async def test_failed_event_stops_the_batch(self):
+        events = [mock.Mock(tx_hash="0x1"), mock.Mock(tx_hash="0x2"), mock.Mock(tx_hash="0x3")]
+        handled = []
+
+        async def handle_event(event):
+            if event.tx_hash == "0x2":
+                raise RuntimeError("database unavailable")
+            handled.append(event.tx_hash)
+
+        with mock.patch("core.pipeline.decode_logs", return_value=events), \
+                mock.patch("core.pipeline.handle_event", side_effect=handle_event):
+            with self.assertRaises(RuntimeError):
+                await handle_logs([{}, {}, {}])
+        self.assertEqual(handled, ["0x1"])
+
+
+class EventDecoderTests(SimpleTestCase):
+    user = "0x00000000000000000000000000000000000000Aa"
+    data = encode(["address", "string"], [user, "https://img/1.jpg$$$https://img/2.jpg"])
+
+    def make_log(self, as_str):
+        log = {
+            "topics": [HexBytes(IMAGE_SUBMITTED_TOPIC)],
+            "data": HexBytes(self.data),
+            "transactionHash": HexBytes("0x" + "ab" * 32),
+            "blockNumber": 7,
+            "logIndex": 2,
+        }
+        if as_str:
+            log.update(topics=[IMAGE_SUBMITTED_TOPIC], data="0x" + self.data.hex(),
+                       transactionHash="0x" + "ab" * 32)
+        return log
+
+    def test_decodes_hexbytes_and_str_logs_alike(self):
+        for as_str in (False, True):
+            event = decode_log(self.make_log(as_str))
+            self.assertEqual(event.user, "0x00000000000000000000000000000000000000AA")
+            self.assertEqual(event.image_url, "https://img/1.jpg$$$https://img/2.jpg")
+            self.assertTrue(event.tx_hash.endswith("ab" * 32))
+            self.assertEqual(event.position, (7, 2))
+
+    def test_rejects_other_events(self):
+        log = {**self.make_log(True), "topics": ["0x" + "00" * 32]}
+        with self.assertRaises(ValueError):
+            decode_log(log)
+
+    def test_decode_logs_skips_undecodable_logs(self):
+        bad = {**self.make_log(True), "topics": []}
+        self.assertEqual([e.log_index for e in decode_logs([bad, self.make_log(False)])], [2])
+
+
+class MicroBatcherTests(SimpleTestCase):
+    async def test_concurrent_items_share_one_batch(self):
+        batches = []
+
+        async def run_batch(items):
+            batches.append(items)
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(run_batch, max_batch_size=3, max_wait=0.05)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+        await batcher.stop()
+        self.assertEqual(results, [0, 10, 20, 30])
+        self.assertEqual(batches, [[0, 1, 2], [3]])
+
+
+def encode_image(format, size=(64, 48)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 100, 50)).save(buffer, format)
+    return buffer.getvalue()
+
+
+class ImageFetcherTests(SimpleTestCase):
+    jpeg = encode_image("JPEG")
+
+    async def fetch(self, path, max_bytes):
+        """Serve a few fixed responses and fetch one of them"""
+        async def image(request):
+            return web.Response(body=self.jpeg, content_type="image/jpeg")
+
+        async def html(request):
+            return web.Response(text="<html></html>", content_type="text/html")
+
+        async def disguised(request):
+            return web.Response(body=b"<html>not an image</html>", content_type="application/octet-stream")
+
+        async def streamed(request):
+            response = web.StreamResponse(headers={"Content-Type": "image/jpeg"})
+            await response.prepare(request)
+            # A 1-byte first chunk must not be judged on its own
+            for piece in (self.jpeg[:1], self.jpeg[1:]):
+                await response.write(piece)
+            return response
+
+        app = web.Application()
+        app.router.add_get("/image.jpg", image)
+        app.router.add_get("/page", html)
+        app.router.add_get("/disguised", disguised)
+        app.router.add_get("/streamed.jpg", streamed)
+        server = TestServer(app)
+        await server.start_server()
+        fetcher = ImageFetcher(max_bytes=max_bytes)
+        try:
+            return await fetcher.fetch(str(server.make_url(path)))
+        finally:
+            await fetcher.close()
+            await server.close()
+
+    async def test_fetches_images_within_the_cap(self):
+        for path in ("/image.jpg", "/streamed.jpg"):
+            self.assertEqual(await self.fetch(path, len(self.jpeg)), self.jpeg)
+
+    async def test_rejects_wrong_types_and_oversized_bodies(self):
+        for path in ("/page", "/disguised"):
+            with self.assertRaises(ImageFetchError):
+                await self.fetch(path, len(self.jpeg))
+        for path in ("/image.jpg", "/streamed.jpg"):
+            with self.assertRaises(ImageFetchError):
+                await self.fetch(path, len(self.jpeg) - 1)
+
+
+class DecodeImageTests(SimpleTestCase):
+    def test_decodes_to_model_input(self):
+        for format in ("JPEG", "PNG", "WEBP"):
+            pixels = decode_image(encode_image(format, (600, 400)), size=32)
+            self.assertEqual((pixels.shape, str(pixels.dtype)), ((32, 32, 3), "uint8"))
+
+    def test_unusable_files_raise_image_fetch_error(self):
+        jpeg = encode_image("JPEG")
+        for data in (jpeg[:len(jpeg) // 2], b"\x89PNG\r\n\x1a\n" + b"junk" * 10, b""):
+            with self.assertRaises(ImageFetchError):
+                decode_image(data)
+
+    def test_large_png_is_rejected(self):
+        with mock.patch("core.image_fetcher.IMAGE_MAX_PIXELS", 100):
+            with self.assertRaises(ImageFetchError):
+                decode_image(encode_image("PNG"))
+            decode_image(encode_image("JPEG"))
+
+    def test_decompression_bomb_is_rejected(self):
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 100):
+            with self.assertRaises(ImageFetchError):
+                decode_image(encode_image("JPEG"))
+
+
+class ResultCacheTests(TestCase):
+    async def test_evicts_least_recently_used_results_down_to_max_entries(self):
+        cache = ResultCache(max_entries=2, evict_every=1000)
+        for i in range(4):
+            await cache.put(f"hash{i}", "v1", f"label{i}")
+        # A hit makes the oldest entry the most recently used
+        self.assertEqual(await cache.get("hash0", "v1"), "label0")
+        self.assertEqual(await cache.evict(), 2)
+        remaining = [h async for h in InferenceResult.objects.order_by("content_hash").values_list("content_hash", flat=True)]
+        self.assertEqual(remaining, ["hash0", "hash3"])
+        self.assertEqual(await cache.evict(), 0)
+
+    async def test_put_evicts_every_evict_every_inserts(self):
+        cache = ResultCache(max_entries=1, evict_every=3)
+        for i in range(3):
+            await cache.put(f"hash{i}", "v1", "label")
+        self.assertEqual(await InferenceResult.objects.acount(), 1)
+
+
+class FairQueueTests(SimpleTestCase):
+    async def drain(self, queue):
+        jobs = []
+        while queue.qsize():
+            jobs.append(await queue.get())
+            queue.task_done()
+        return jobs
+
+    async def test_owners_take_turns_within_a_class(self):
+        queue = FairQueue(key=lambda job: job[0])
+        for job in [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("c", 1)]:
+            await queue.put(job)
+        self.assertEqual(await self.drain(queue), [("a", 1), ("b", 1), ("c", 1), ("a", 2), ("a", 3)])
+
+    async def test_classes_are_served_by_weight(self):
+        queue = FairQueue(priority=lambda job: job[0], weights=(2, 1))
+        for i in range(4):
+            await queue.put((0, i))
+            await queue.put((1, i))
+        levels = [level for level, _ in await self.drain(queue)]
+        self.assertEqual(levels, [0, 0, 1, 0, 0, 1, 1, 1])
+
+    async def test_put_waits_while_full(self):
+        queue = FairQueue(maxsize=1)
+        await queue.put("first")
+        blocked = asyncio.create_task(queue.put("second"))
+        await asyncio.sleep(0)
+        self.assertFalse(blocked.done())
+        self.assertEqual(await queue.get(), "first")
+        await asyncio.wait_for(blocked, 1)
+        self.assertEqual(queue.qsize(), 1)
+
+    async def test_join_waits_for_task_done(self):
+        queue = FairQueue()
+        await queue.put("job")
+        await queue.get()
+        joined = asyncio.create_task(queue.join())
+        await asyncio.sleep(0)
+        self.assertFalse(joined.done())
+        queue.task_done()
+        await asyncio.wait_for(joined, 1)
+
+
+class FarmerPriorityTests(SimpleTestCase):
+    def priority(self, level, auth_points, correct_report_count):
+        info = mock.Mock(spec=FarmerInfo, level=level, auth_points=auth_points,
+                         correct_report_count=correct_report_count)
+        with mock.patch("core.pipeline.farmer_cache.get", return_value=info):
+            return farmer_priority("0xuser")
+
+    def test_default_thresholds_reach_every_class(self):
+        self.assertEqual(self.priority(level=3, auth_points=0, correct_report_count=0), 0)
+        self.assertEqual(self.priority(level=1, auth_points=100, correct_report_count=0), 0)
+        self.assertEqual(self.priority(level=1, auth_points=50, correct_report_count=0), 1)
+        self.assertEqual(self.priority(level=1, auth_points=5, correct_report_count=2), 1)
+        self.assertEqual(self.priority(level=0, auth_points=0, correct_report_count=0), 2)
+
+    def test_unknown_farmer_gets_the_normal_class(self):
+        with mock.patch("core.pipeline.farmer_cache.get", side_effect=RuntimeError("rpc down")):
+            self.assertEqual(farmer_priority("0xuser"), 1)
+
+
+class JoinWithinTests(SimpleTestCase):
+    def test_keeps_leading_ids_that_fit(self):
+        self.assertEqual(join_within(["aaaa", "bbbb", "cccc"], 11), "aaaa$$$bbbb")
+        self.assertEqual(join_within(["aaaa"], 3), "")
+        self.assertEqual(join_within([], 10), "")
+
+
+class PendingImagesViewTests(SimpleTestCase):
+    raw = "$$$".join(f"https://img/{i}.jpg" for i in range(5))
+
+    def get(self, query="", **headers):
+        with mock.patch("core.views.pending_images_cache.aget", return_value=(self.raw, "digest")):
+            return self.client.get(f"/review/{query}", headers=headers)
+
+    def test_without_paging_parameters_returns_every_url(self):
+        body = self.get().json()
+        self.assertEqual((len(body["pending_urls"]), body["count"], body["next_offset"]), (5, 5, None))
+
+    def test_pages_with_offset_and_limit(self):
+        body = self.get("?offset=1&limit=2").json()
+        self.assertEqual(body["pending_urls"], ["https://img/1.jpg", "https://img/2.jpg"])
+        self.assertEqual(body["next_offset"], 3)
+        self.assertIsNone(self.get("?offset=3&limit=2").json()["next_offset"])
+        self.assertEqual(self.get("?limit=x").status_code, 400)
+
+    def test_unchanged_page_is_answered_with_304(self):
+        etag = self.get("?limit=2")["ETag"]
+        self.assertEqual(self.get("?limit=2", if_none_match=etag).status_code, 304)
+        self.assertEqual(self.get("?limit=3", if_none_match=etag).status_code, 200)
+
+    async def test_streams_ndjson_from_offset(self):
+        with mock.patch("core.views.pending_images_cache.aget", return_value=(self.raw, "digest")):
+            response = await self.async_client.get("/review/?format=ndjson&offset=3")
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(lines, ['{"url": "https://img/3.jpg"}', '{"url": "https://img/4.jpg"}'])
+
+
+class PendingImagesCacheTests(SimpleTestCase):
+    async def test_reuses_an_entry_until_the_block_or_generation_changes(self):
+        loader = mock.AsyncMock(return_value="a$$$b")
+        pending = PendingImagesCache(async_loader=loader)
+        block = mock.AsyncMock(return_value=10)
+        with mock.patch.object(pending, "ablock_number", block), \
+                mock.patch("core.pending_cache.GENERATION_KEY", "test:pending:generation"):
+            first = await pending.aget()
+            self.assertEqual(await pending.aget(), first)
+            self.assertEqual(loader.await_count, 1)
+            await pending.ainvalidate()
+            await pending.aget()
+            self.assertEqual(loader.await_count, 2)
+            block.return_value = 11
+            await pending.aget()
+            self.assertEqual(loader.await_count, 3)
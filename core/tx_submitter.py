@@ -0,0 +1,95 @@
+import logging
+import threading
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Node error messages that mean our local nonce no longer matches the chain
+NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "invalid nonce",
+    "replacement transaction underpriced",
+    "transaction underpriced",
+)
+ALREADY_KNOWN_ERRORS = (
+    "already known",
+    "known transaction",
+)
+
+
+def _error_message(error):
+    if error.args and isinstance(error.args[0], dict):
+        return str(error.args[0].get("message", "")).lower()
+    return str(error).lower()
+
+
+class NonceManager:
+    """Hands out sequential nonces for one account without asking the node each time"""
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce = None
+
+    def _fetch(self):
+        # "pending" includes our own transactions still waiting in the mempool
+        return self.w3.eth.get_transaction_count(self.address, "pending")
+
+    def allocate(self):
+        """Reserve the next nonce, syncing from the chain on first use"""
+        with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = self._fetch()
+                logger.info(f"Synced nonce from chain: {self._next_nonce}")
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def resync(self):
+        """Drop the local counter and reload it from the chain"""
+        with self._lock:
+            self._next_nonce = self._fetch()
+            logger.warning(f"Resynced nonce from chain: {self._next_nonce}")
+            return self._next_nonce
+
+
+class TransactionSubmitter:
+    """Builds, signs and sends contract transactions back to back using a local nonce"""
+
+    def __init__(self, w3, address, private_key, max_attempts=3):
+        self.w3 = w3
+        self.address = address
+        self.private_key = private_key
+        self.max_attempts = max_attempts
+        self.nonces = NonceManager(w3, address)
+
+    def submit(self, contract_function):
+        """Sign and send a contract call, returning the transaction hash without waiting for it to be mined"""
+        for attempt in range(1, self.max_attempts + 1):
+            nonce = self.nonces.allocate()
+            logger.info(f"Using nonce: {nonce}")
+            try:
+                tx = contract_function.build_transaction({
+                    "from": self.address,
+                    "nonce": nonce,
+                })
+                signed_tx = self.w3.eth.account.sign_transaction(tx, private_key=self.private_key)
+            except Exception:
+                # The nonce was never used, so the counter now has a gap
+                self.nonces.resync()
+                raise
+
+            try:
+                return self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception as e:
+                message = _error_message(e)
+                if any(err in message for err in ALREADY_KNOWN_ERRORS):
+                    logger.info(f"Transaction with nonce {nonce} already in mempool")
+                    return signed_tx.hash
+                self.nonces.resync()
+                if any(err in message for err in NONCE_ERRORS) and attempt < self.max_attempts:
+                    logger.warning(f"Nonce {nonce} rejected ({message}), retrying (attempt {attempt}/{self.max_attempts})")
+                    continue
+                raise
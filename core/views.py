@@ -1,12 +1,69 @@
-from django.http import JsonResponse
-from .get_pending_images import get_pending_images
+import json
+import logging
+import os
+from itertools import islice
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from .get_pending_images import count_pending_urls, iter_pending_urls
+from .pending_cache import pending_images_cache
 
+# Configure logging for this module
+logger = logging.getLogger(__name__)
 
-def show_pending_images(request):
+PENDING_PAGE_SIZE = int(os.getenv('PENDING_PAGE_SIZE', '100'))
+PENDING_MAX_PAGE_SIZE = int(os.getenv('PENDING_MAX_PAGE_SIZE', '1000'))
+
+
+def _page_params(request):
+    """Parse offset/limit query parameters, clamping limit to PENDING_MAX_PAGE_SIZE.
+
+    Without either parameter the limit is None and the whole list is returned,
+    as it was before pagination, so app builds that ignore next_offset keep working.
+    """
+    if "offset" not in request.GET and "limit" not in request.GET:
+        return 0, None
+    offset = max(int(request.GET.get("offset", 0)), 0)
+    limit = int(request.GET.get("limit", PENDING_PAGE_SIZE))
+    return offset, min(max(limit, 1), PENDING_MAX_PAGE_SIZE)
+
+
+async def _stream_ndjson(urls):
+    for url in urls:
+        yield json.dumps({"url": url}) + "\n"
+
+
+async def show_pending_images(request):
     if request.method == "GET":
         try:
-            pending_urls = get_pending_images()
-            return JsonResponse({"pending_urls": pending_urls})
+            offset, limit = _page_params(request)
+        except ValueError:
+            return JsonResponse({"error": "offset and limit must be integers."}, status=400)
+        # ?format=ndjson streams every URL from offset on, one JSON object per line
+        stream = request.GET.get("format") == "ndjson" or "application/x-ndjson" in request.headers.get("Accept", "")
+        try:
+            raw, digest = await pending_images_cache.aget()
+        except Exception as e:
+            # Same answer as an uncached failed contract call, but never cached
+            logger.error(f"Error fetching pending images: {e}", exc_info=True)
+            return JsonResponse({"pending_urls": [], "count": 0, "next_offset": None})
+        try:
+            # Each page or stream is its own representation of the same list
+            etag = f'"{digest}-{offset}-{"ndjson" if stream else limit or "all"}"'
+            # Polling clients that already hold this page get an empty 304
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+            elif stream:
+                urls = islice(iter_pending_urls(raw), offset, None)
+                response = StreamingHttpResponse(_stream_ndjson(urls), content_type="application/x-ndjson")
+            else:
+                count = count_pending_urls(raw)
+                end = None if limit is None else offset + limit
+                pending_urls = list(islice(iter_pending_urls(raw), offset, end))
+                next_offset = end if end is not None and end < count else None
+                response = JsonResponse({"pending_urls": pending_urls, "count": count, "next_offset": next_offset})
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+            return response
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
     else:
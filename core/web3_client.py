@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3, AsyncWeb3, AsyncHTTPProvider
+from dotenv import load_dotenv
+from CropChain.settings import BASE_DIR
+
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+HTTP_PROVIDER = os.getenv('HTTP_PROVIDER_1')
+CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS')
+abi = os.getenv('ABI')
+
+# Keep-alive connections kept open per provider host
+WEB3_POOL_SIZE = int(os.getenv('WEB3_POOL_SIZE', '20'))
+WEB3_REQUEST_TIMEOUT = float(os.getenv('WEB3_REQUEST_TIMEOUT', '30'))
+
+# Process-wide registry, keyed by provider URL and (provider URL, contract address)
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+_contracts = {}
+_async_contracts = {}
+
+
+def _session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=WEB3_POOL_SIZE, pool_maxsize=WEB3_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_web3(provider_url=None):
+    """Return the shared sync Web3 client for a provider, reusing one keep-alive session"""
+    provider_url = provider_url or HTTP_PROVIDER
+    client = _clients.get(provider_url)
+    if client is None:
+        with _lock:
+            client = _clients.get(provider_url)
+            if client is None:
+                client = Web3(Web3.HTTPProvider(
+                    provider_url,
+                    request_kwargs={"timeout": WEB3_REQUEST_TIMEOUT},
+                    session=_session(),
+                ))
+                _clients[provider_url] = client
+                logger.info(f"Created Web3 client for {provider_url}")
+    return client
+
+
+def get_async_web3(provider_url=None):
+    """Return the shared AsyncWeb3 client for a provider"""
+    provider_url = provider_url or HTTP_PROVIDER
+    client = _async_clients.get(provider_url)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(provider_url)
+            if client is None:
+                # AsyncHTTPProvider keeps one aiohttp session per event loop and reuses its connections
+                client = AsyncWeb3(AsyncHTTPProvider(
+                    provider_url,
+                    request_kwargs={"timeout": WEB3_REQUEST_TIMEOUT},
+                ))
+                _async_clients[provider_url] = client
+                logger.info(f"Created AsyncWeb3 client for {provider_url}")
+    return client
+
+
+def get_contract(address=None, provider_url=None, contract_abi=None):
+    """Return the cached contract instance for (provider, address)"""
+    provider_url = provider_url or HTTP_PROVIDER
+    address = Web3.to_checksum_address(address or CONTRACT_ADDRESS)
+    key = (provider_url, address)
+    contract = _contracts.get(key)
+    if contract is None:
+        w3 = get_web3(provider_url)
+        with _lock:
+            contract = _contracts.get(key)
+            if contract is None:
+                contract = w3.eth.contract(address=address, abi=contract_abi or abi)
+                _contracts[key] = contract
+                logger.info(f"Contract loaded at address: {address}")
+    return contract
+
+
+def get_async_contract(address=None, provider_url=None, contract_abi=None):
+    """Return the cached async contract instance for (provider, address)"""
+    provider_url = provider_url or HTTP_PROVIDER
+    address = Web3.to_checksum_address(address or CONTRACT_ADDRESS)
+    key = (provider_url, address)
+    contract = _async_contracts.get(key)
+    if contract is None:
+        w3 = get_async_web3(provider_url)
+        with _lock:
+            contract = _async_contracts.get(key)
+            if contract is None:
+                contract = w3.eth.contract(address=address, abi=contract_abi or abi)
+                _async_contracts[key] = contract
+                logger.info(f"Async contract loaded at address: {address}")
+    return contract
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FCMToken
+from .models import FCMToken, NotificationJob, NotificationSegment
 
 # Register your models here.
 @admin.register(FCMToken)
@@ -8,3 +8,18 @@ class FCMTokenAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'updated_at')
     search_fields = ('device_id', 'token', 'aadhaar_number')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'aadhaar_number', 'segment', 'recipients', 'title', 'status', 'tokens', 'success', 'failure', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('aadhaar_number', 'segment', 'title')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(NotificationSegment)
+class NotificationSegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'updated_at')
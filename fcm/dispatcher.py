@@ -0,0 +1,387 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from datetime import timedelta
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from .models import FCMToken, NotificationJob
+from .token_cache import token_cache
+from .token_pruning import is_permanent, token_pruner
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_SIZE = min(int(os.getenv('FCM_BATCH_SIZE', '500')), 500)
+FCM_BATCH_WAIT = float(os.getenv('FCM_BATCH_WAIT_MS', '100')) / 1000
+FCM_MAX_CONCURRENT_BATCHES = int(os.getenv('FCM_MAX_CONCURRENT_BATCHES', '4'))
+FCM_MAX_RETRIES = int(os.getenv('FCM_MAX_RETRIES', '5'))
+FCM_RETRY_BASE_DELAY = float(os.getenv('FCM_RETRY_BASE_DELAY', '1'))
+# Jobs still queued after this long were accepted by a worker that went away, so another one sends them
+FCM_JOB_RECOVER_AFTER = float(os.getenv('FCM_JOB_RECOVER_AFTER', '120'))
+# Jobs with no progress for this long while sending were cut off and are marked failed
+FCM_JOB_STALE_AFTER = float(os.getenv('FCM_JOB_STALE_AFTER', '600'))
+FCM_JOB_RECOVERY_INTERVAL = float(os.getenv('FCM_JOB_RECOVERY_INTERVAL', '60'))
+FCM_JOB_RECOVERY_BATCH = int(os.getenv('FCM_JOB_RECOVERY_BATCH', '100'))
+
+# Errors worth retrying after a pause; everything else is final for that message
+RETRYABLE_ERRORS = (
+    exceptions.ResourceExhaustedError,
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+)
+
+
+class NotificationRequest:
+    """One notify call: every device of an Aadhaar number gets the same message"""
+
+    def __init__(self, aadhaar, title, body, data, notification, future, job_id=None):
+        self.aadhaar = str(aadhaar)
+        self.title = title
+        self.body = body
+        self.data = {key: str(value) for key, value in (data or {}).items()}
+        self.notification = notification
+        self.future = future
+        self.job_id = job_id
+        self.tokens = 0
+        self.pending = 0
+        self.success = 0
+        self.failure = 0
+        self.failed_tokens = []
+        # Set while a broadcast is still streaming tokens from the database
+        self.resolving = False
+
+    def message_for(self, token):
+        return messaging.Message(
+            notification=messaging.Notification(title=self.title, body=self.body) if self.notification else None,
+            data=self.data,
+            token=token,
+        )
+
+
+class BroadcastRequest(NotificationRequest):
+    """One message fanned out to every device of many Aadhaar numbers"""
+
+    def __init__(self, aadhaar_numbers, title, body, data, notification, future, job_id=None):
+        super().__init__("", title, body, data, notification, future, job_id)
+        self.aadhaar_numbers = sorted({str(aadhaar) for aadhaar in aadhaar_numbers})
+        self.resolving = True
+
+
+class NotificationDispatcher:
+    """Accepts notify requests without blocking and sends them in cross-user FCM batches.
+
+    Sending happens on a dedicated background thread with its own event loop,
+    so callers from async code, sync views or other threads never wait on
+    Firebase. Requests collected within FCM_BATCH_WAIT are merged into
+    batches of up to FCM_BATCH_SIZE messages, sent with bounded concurrency
+    and retried with exponential backoff on quota or availability errors.
+
+    Requests backed by a NotificationJob row are claimed (queued -> sending)
+    before they are sent, and every dispatcher periodically resubmits jobs
+    left queued by a worker that restarted, so an accepted job is not lost.
+    """
+
+    def __init__(self, batch_size=FCM_BATCH_SIZE, batch_wait=FCM_BATCH_WAIT,
+                 max_concurrent=FCM_MAX_CONCURRENT_BATCHES, max_retries=FCM_MAX_RETRIES,
+                 retry_base_delay=FCM_RETRY_BASE_DELAY, recover_after=FCM_JOB_RECOVER_AFTER,
+                 stale_after=FCM_JOB_STALE_AFTER, recovery_interval=FCM_JOB_RECOVERY_INTERVAL):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.recover_after = recover_after
+        self.stale_after = stale_after
+        self.recovery_interval = recovery_interval
+        self._loop = None
+        self._queue = None
+        self._lock = threading.Lock()
+        # Strong references to tasks on the dispatcher loop so none is garbage collected mid-flight
+        self._tasks = set()
+
+    def start(self):
+        """Start the dispatcher thread now, e.g. so a restarted process picks up abandoned jobs"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+            thread = threading.Thread(target=self._run_loop, args=(ready,), name="fcm-dispatcher", daemon=True)
+            thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._spawn(self._collect())
+        self._spawn(token_pruner.run())
+        self._spawn(self._recover())
+        ready.set()
+        logger.info("FCM notification dispatcher started")
+        self._loop.run_forever()
+
+    def submit(self, aadhaar, title=None, body=None, data=None, notification=True, job_id=None):
+        """Queue a notification and return a concurrent Future resolving to delivery counts.
+
+        With ``job_id`` the counts are also written to that NotificationJob when sending finishes.
+        """
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        request = NotificationRequest(aadhaar, title, body, data, notification, future, job_id)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, request)
+        return future
+
+    def submit_broadcast(self, aadhaar_numbers, title=None, body=None, data=None, notification=True, job_id=None):
+        """Queue one message for many Aadhaar numbers; progress is saved to ``job_id`` after every batch"""
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        request = BroadcastRequest(aadhaar_numbers, title, body, data, notification, future, job_id)
+        self._loop.call_soon_threadsafe(self._start_broadcast, request)
+        return future
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _start_broadcast(self, request):
+        self._spawn(self._broadcast(request))
+
+    async def _claim(self, request):
+        """Mark the request's job as sending, returning False if another worker already took it"""
+        if request.job_id is None:
+            return True
+        claimed = await NotificationJob.objects.filter(
+            id=request.job_id, status=NotificationJob.STATUS_QUEUED
+        ).aupdate(status=NotificationJob.STATUS_SENDING, updated_at=timezone.now())
+        if not claimed:
+            logger.info(f"Notification job {request.job_id} was already taken by another worker")
+            request.future.cancel()
+        return bool(claimed)
+
+    async def _broadcast(self, request):
+        """Page tokens by pk with indexed queries and hand each page to FCM as one batch"""
+        try:
+            if not await self._claim(request):
+                return
+        except Exception as e:
+            logger.error(f"Error claiming broadcast job {request.job_id}: {e}")
+            request.future.set_exception(e)
+            return
+        logger.info(f"Broadcasting to {len(request.aadhaar_numbers)} Aadhaar numbers")
+        tokens = FCMToken.objects.filter(aadhaar_number__in=request.aadhaar_numbers).order_by("pk")
+        triples = []
+        last_pk = 0
+        try:
+            while True:
+                # Plain async iteration fetches each page off the loop; only one page is held at a time
+                rows = [
+                    row async for row in tokens.filter(pk__gt=last_pk).values_list(
+                        "pk", "aadhaar_number", "token"
+                    )[:self.batch_size]
+                ]
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                triples = [(request, aadhaar, token) for _, aadhaar, token in rows]
+                request.tokens += len(triples)
+                request.pending += len(triples)
+                await self._start_batch(triples)
+                triples = []
+        except Exception as e:
+            logger.error(f"Error resolving broadcast tokens: {e}", exc_info=True)
+            # Tokens never handed to a batch count as failed so the totals add up
+            for _, _, token in triples:
+                self._record(request, token, False)
+            request.resolving = False
+            if not request.future.done():
+                request.future.set_exception(e)
+                self._save_job(request, NotificationJob.STATUS_FAILED, str(e))
+            return
+        request.resolving = False
+        if request.pending <= 0:
+            self._finish(request)
+
+    async def _start_batch(self, triples):
+        await self._semaphore.acquire()
+        self._spawn(self._send_batch(triples))
+
+    async def _collect(self):
+        while True:
+            requests = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_wait
+            while True:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    requests.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._dispatch(requests)
+            except Exception as e:
+                logger.error(f"Error dispatching notifications: {e}", exc_info=True)
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                        self._save_job(request, NotificationJob.STATUS_FAILED, str(e))
+
+    async def _dispatch(self, requests):
+        requests = [request for request in requests if await self._claim(request)]
+        # Cached tokens, plus one indexed query for everyone else in this window
+        tokens_by_aadhaar = await token_cache.get_many({request.aadhaar for request in requests})
+        triples = []
+        for request in requests:
+            tokens = tokens_by_aadhaar.get(request.aadhaar, [])
+            if not tokens:
+                logger.warning(f"No FCM tokens found for aadhar ID: {request.aadhaar}")
+                self._finish(request)
+                continue
+            request.tokens = request.pending = len(tokens)
+            triples.extend((request, request.aadhaar, token) for token in tokens)
+
+        for start in range(0, len(triples), self.batch_size):
+            await self._start_batch(triples[start:start + self.batch_size])
+
+    async def _recover(self):
+        while True:
+            try:
+                await self.recover_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification job recovery failed: {e}")
+            await asyncio.sleep(self.recovery_interval)
+
+    async def recover_jobs(self):
+        """Resubmit jobs left queued by a restarted worker and fail jobs cut off while sending"""
+        now = timezone.now()
+        interrupted = await NotificationJob.objects.filter(
+            status=NotificationJob.STATUS_SENDING, updated_at__lt=now - timedelta(seconds=self.stale_after)
+        ).aupdate(
+            status=NotificationJob.STATUS_FAILED, last_error="Interrupted before delivery finished", updated_at=now
+        )
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted notification jobs failed")
+        abandoned = NotificationJob.objects.filter(
+            status=NotificationJob.STATUS_QUEUED, updated_at__lt=now - timedelta(seconds=self.recover_after)
+        ).order_by("id")
+        recovered = 0
+        async for job in abandoned[:FCM_JOB_RECOVERY_BATCH]:
+            # Claimed when dispatched, so a job found by two workers is still sent once
+            future = concurrent.futures.Future()
+            if job.aadhaar_number:
+                # Single jobs come from sendNotification, which sends data-only messages
+                data = {"title": job.title, "body": job.body, **job.data}
+                self._queue.put_nowait(NotificationRequest(job.aadhaar_number, job.title, job.body, data, False, future, job.id))
+            else:
+                self._start_broadcast(BroadcastRequest(job.aadhaar_numbers, job.title, job.body, job.data, True, future, job.id))
+            recovered += 1
+        if recovered:
+            logger.warning(f"Resubmitted {recovered} notification jobs left queued by another worker")
+        return recovered
+
+    async def _send_batch(self, triples):
+        # Tokens FCM rejected permanently in this batch, deleted together at the end
+        dead = {}
+        try:
+            attempt = 0
+            while triples:
+                messages = [request.message_for(token) for request, _, token in triples]
+                try:
+                    response = await asyncio.to_thread(messaging.send_each, messages)
+                except RETRYABLE_ERRORS as e:
+                    retry = list(triples)
+                    logger.warning(f"FCM batch of {len(triples)} failed: {e}")
+                else:
+                    retry = []
+                    for (request, aadhaar, token), resp in zip(triples, response.responses):
+                        if resp.success:
+                            self._record(request, token, True)
+                        elif isinstance(resp.exception, RETRYABLE_ERRORS):
+                            retry.append((request, aadhaar, token))
+                        else:
+                            if is_permanent(resp.exception):
+                                dead[token] = aadhaar
+                            self._record(request, token, False)
+                    logger.info(f"FCM batch sent: {response.success_count} succeeded, {response.failure_count} failed")
+                    self._save_progress(triples)
+
+                attempt += 1
+                if retry and attempt > self.max_retries:
+                    logger.error(f"Giving up on {len(retry)} FCM messages after {self.max_retries} retries")
+                    for request, _, token in retry:
+                        self._record(request, token, False)
+                    retry = []
+                if retry:
+                    delay = self.retry_base_delay * (2 ** (attempt - 1))
+                    logger.info(f"Retrying {len(retry)} FCM messages in {delay}s")
+                    await asyncio.sleep(delay)
+                triples = retry
+        except Exception as e:
+            logger.error(f"Error sending FCM batch: {e}", exc_info=True)
+            for request, _, token in triples:
+                self._record(request, token, False)
+        try:
+            await token_pruner.prune(dead)
+        except Exception as e:
+            logger.error(f"Error pruning unregistered tokens: {e}")
+        finally:
+            self._semaphore.release()
+
+    def _record(self, request, token, success):
+        if success:
+            request.success += 1
+        else:
+            request.failure += 1
+            request.failed_tokens.append(token)
+        request.pending -= 1
+        if request.pending <= 0 and not request.resolving:
+            self._finish(request)
+
+    def _finish(self, request):
+        if request.failed_tokens:
+            logger.warning(f"List of tokens that caused failures: {request.failed_tokens}")
+        if not request.future.done():
+            request.future.set_result({
+                "tokens": request.tokens,
+                "success": request.success,
+                "failure": request.failure,
+            })
+            self._save_job(request, NotificationJob.STATUS_DONE)
+
+    def _save_progress(self, triples):
+        # Running totals for jobs still in flight, e.g. a broadcast spanning many batches
+        for request in {request for request, _, _ in triples}:
+            if not request.future.done():
+                self._save_job(request, NotificationJob.STATUS_SENDING)
+
+    def _save_job(self, request, status, error=""):
+        if request.job_id is not None:
+            self._spawn(self._update_job(request, status, error))
+
+    async def _update_job(self, request, status, error):
+        try:
+            await NotificationJob.objects.filter(id=request.job_id).aupdate(
+                status=status,
+                tokens=request.tokens,
+                success=request.success,
+                failure=request.failure,
+                last_error=error,
+                updated_at=timezone.now(),
+            )
+        except Exception as e:
+            logger.error(f"Error saving notification job {request.job_id}: {e}")
+
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-16 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fcm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fcmtoken',
+            name='aadhaar_number',
+            field=models.CharField(db_index=True, max_length=12),
+        ),
+    ]
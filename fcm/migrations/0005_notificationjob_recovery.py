@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fcm', '0004_notificationsegment_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjob',
+            name='aadhaar_numbers',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='notificationjob',
+            index=models.Index(fields=['status', 'updated_at'], name='notification_job_status_idx'),
+        ),
+    ]
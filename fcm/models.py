@@ -1,8 +1,70 @@
 from django.db import models
 
+
+class FCMTokenQuerySet(models.QuerySet):
+    def upsert(self, tokens):
+        """Insert or update FCMToken instances by device_id in a single statement"""
+        # Postgres rejects an upsert that touches the same row twice, so the last record per device wins
+        unique = list({token.device_id: token for token in tokens}.values())
+        return self.bulk_create(
+            unique,
+            update_conflicts=True,
+            unique_fields=['device_id'],
+            update_fields=['token', 'aadhaar_number', 'updated_at'],
+        )
+
+
 class FCMToken(models.Model):
     device_id = models.CharField(max_length=100, unique=True)
     token = models.CharField(max_length=255)
-    aadhaar_number = models.CharField(max_length=12)  
+    aadhaar_number = models.CharField(max_length=12, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FCMTokenQuerySet.as_manager()
+
+
+class NotificationSegment(models.Model):
+    """A named, reusable list of Aadhaar numbers for broadcasts, e.g. every farmer in a district"""
+    name = models.CharField(max_length=100, unique=True)
+    aadhaar_numbers = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class NotificationJob(models.Model):
+    """A notification accepted by the API, with delivery counts filled in once it is sent"""
+    STATUS_QUEUED = "queued"
+    STATUS_SENDING = "sending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    aadhaar_number = models.CharField(max_length=12, blank=True)
+    segment = models.CharField(max_length=100, blank=True)
+    # Broadcast recipients, kept so another worker can resend a job whose worker restarted
+    aadhaar_numbers = models.JSONField(default=list, blank=True)
+    recipients = models.PositiveIntegerField(default=1)
+    title = models.CharField(max_length=50, blank=True)
+    body = models.CharField(max_length=300, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    tokens = models.PositiveIntegerField(default=0)
+    success = models.PositiveIntegerField(default=0)
+    failure = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="notification_job_status_idx"),
+        ]
@@ -1,9 +1,8 @@
 import logging
 import os
-from .models import FCMToken
+from .dispatcher import dispatcher
 import firebase_admin
-from firebase_admin import credentials, messaging
-from asgiref.sync import sync_to_async
+from firebase_admin import credentials
 from dotenv import load_dotenv
 from CropChain.settings import BASE_DIR
 import json
@@ -31,63 +30,27 @@ except FileNotFoundError:
     logger.warning("Firebase notifications will not work without the service account key file.")
     pass
 
+def queueNotification(aadharId, title, body, imageId, imageType, job_id=None):
+    """Hand a data notification to the dispatcher and return its delivery Future without waiting"""
+    # Prepare notification data
+    data ={
+        "title": title,
+        "body" : body,
+        "imageId" : imageId,
+        "imageType": imageType
+    }
+
+    # Tokens are resolved and sent in FCM batches on the dispatcher's own loop
+    logger.info(f"Queueing notification for Aadhar ID: {aadharId}")
+    return dispatcher.submit(aadharId, data=data, notification=False, job_id=job_id)
+
 async def sendNotifications(aadharId, title, body,imageId,imageType):
     """Send FCM notification to user with proper logging"""
     try:
-        
-        # Get all FCM tokens for the given aadhar ID - use sync_to_async for database operations
-        logger.info(f"Searching for FCM tokens for Aadhar ID: {aadharId}")
-        fcm_tokens = await sync_to_async(FCMToken.objects.filter)(aadhaar_number=str(aadharId))
-        tokens = await sync_to_async(lambda: [token.token for token in fcm_tokens])()
-        
-        # If no tokens found, return early
-        if not tokens:
-            logger.warning(f"No FCM tokens found for aadhar ID: {aadharId}")
-            return False
-        
-        logger.info(f"Found {len(tokens)} FCM tokens for user")
-        
-        # Prepare notification data
-        data ={
-            "title": title,
-            "body" : body,
-            "imageId" : imageId,
-            "imageType": imageType
-        }
-        
-        # Create the multicast message
-        logger.info("Creating notification message...")
-        message = messaging.MulticastMessage(
-            data=data,
-            tokens=tokens,
-        )
-        
-        # Send the notification
-        logger.info("Sending notification to Firebase...")
-        response = messaging.send_each_for_multicast(message)
-        
-        # Handle failures
-        if response.failure_count > 0:
-            responses = response.responses
-            failed_tokens = []
-            for idx, resp in enumerate(responses):
-                if not resp.success:
-                    # The order of responses corresponds to the order of the registration tokens.
-                    failed_tokens.append(tokens[idx])
-            logger.warning(f"List of tokens that caused failures: {failed_tokens}")
-            
-            # Optionally remove failed tokens from database - use sync_to_async
-            # logger.info("Cleaning up failed tokens from database...")
-            # for failed_token in failed_tokens:
-            #     await sync_to_async(FCMToken.objects.filter(token=failed_token).delete)()
-            # logger.info(f"Removed {len(failed_tokens)} failed tokens from database")
-        
-        logger.info(f"Successfully sent messages: {response.success_count}")
-        logger.info(f"Failed to send messages: {response.failure_count}")
+        queueNotification(aadharId, title, body, imageId, imageType)
         
         return True
         
     except Exception as e:
         logger.error(f"Error sending notification: {str(e)}", exc_info=True)
-        return False
-
+        return False
\ No newline at end of file
@@ -1,24 +1,27 @@
+import json
 from rest_framework import serializers
-from .models import FCMToken
+from .models import FCMToken, NotificationJob
+
+# FCM rejects messages whose notification and data payload exceed 4096 bytes; leave room for keys and overhead
+FCM_MAX_PAYLOAD_BYTES = 3584
+
+class FCMTokenListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        # One upsert for the whole batch instead of a lookup and write per device
+        return FCMToken.objects.upsert([FCMToken(**item) for item in validated_data])
+
 
 class FCMTokenSerializer(serializers.Serializer):
     device_id = serializers.CharField(max_length=100)
     token = serializers.CharField(max_length=255)
     aadhaar_number = serializers.CharField(max_length=12)
-    
+
+    class Meta:
+        list_serializer_class = FCMTokenListSerializer
+
     def create(self, validated_data):
-        device_id = validated_data.get('device_id')
-        token = validated_data.get('token')
-        aadhaar_number = validated_data.get('aadhaar_number')
-        
-        # Use update_or_create to handle both create and update cases
-        fcm_token, created = FCMToken.objects.update_or_create(
-            device_id=device_id,
-            defaults={
-                'token': token,
-                'aadhaar_number': aadhaar_number
-            }
-        )
+        # Single INSERT ... ON CONFLICT (device_id) DO UPDATE handles both create and update cases
+        fcm_token, = FCMToken.objects.upsert([FCMToken(**validated_data)])
         return fcm_token
     
 
@@ -35,3 +38,31 @@ class NotificationSerializer(serializers.Serializer):
         if not value.isdigit() or len(value) != 12:
             raise serializers.ValidationError("Aadhar must be exactly 12 digits")
         return value
+
+
+class BroadcastSerializer(serializers.Serializer):
+    aadhar_ids = serializers.ListField(child=serializers.CharField(max_length=12), required=False, allow_empty=False)
+    segment = serializers.CharField(max_length=100, required=False)
+    title = serializers.CharField(max_length = 50)
+    body = serializers.CharField(max_length = 300)
+    data = serializers.DictField(child=serializers.CharField(), required=False)
+
+    def validate_aadhar_ids(self, value):
+        invalid = [aadhar for aadhar in value if not aadhar.isdigit() or len(aadhar) != 12]
+        if invalid:
+            raise serializers.ValidationError(f"Aadhar must be exactly 12 digits: {invalid[:10]}")
+        return value
+
+    def validate(self, attrs):
+        if ('aadhar_ids' in attrs) == ('segment' in attrs):
+            raise serializers.ValidationError("Provide either aadhar_ids or segment")
+        payload = json.dumps({"title": attrs["title"], "body": attrs["body"], "data": attrs.get("data", {})})
+        if len(payload.encode()) > FCM_MAX_PAYLOAD_BYTES:
+            raise serializers.ValidationError(f"Notification payload must be at most {FCM_MAX_PAYLOAD_BYTES} bytes")
+        return attrs
+
+
+class NotificationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationJob
+        fields = ['id', 'aadhaar_number', 'segment', 'recipients', 'status', 'tokens', 'success', 'failure', 'last_error', 'created_at', 'updated_at']
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from . import dispatcher as dispatcher_module
+from .models import FCMToken, NotificationJob
+from .serializer import FCM_MAX_PAYLOAD_BYTES, BroadcastSerializer
+from .token_cache import TokenCache, token_cache
+from .token_pruning import is_permanent
 
-# Create your tests here.
+
+class FakeBatchResponse:
+    def __init__(self, messages):
+        self.responses = [mock.Mock(success=True, exception=None) for _ in messages]
+        self.success_count = len(messages)
+        self.failure_count = 0
+
+
+class NotificationDispatchTests(TransactionTestCase):
+    # The dispatcher runs on its own thread, so rows must be committed for it to see them
+    def setUp(self):
+        token_cache.invalidate()
+        self.batches = []
+
+    def send_each(self, messages):
+        self.batches.append(sorted(message.token for message in messages))
+        return FakeBatchResponse(messages)
+
+    def test_requests_for_different_farmers_share_one_batch(self):
+        FCMToken.objects.create(device_id="d1", token="t1", aadhaar_number="111111111111")
+        FCMToken.objects.create(device_id="d2", token="t2", aadhaar_number="111111111111")
+        FCMToken.objects.create(device_id="d3", token="t3", aadhaar_number="222222222222")
+        dispatcher = dispatcher_module.NotificationDispatcher(batch_wait=0.2)
+        with mock.patch.object(dispatcher_module.messaging, "send_each", side_effect=self.send_each):
+            first = dispatcher.submit("111111111111", title="t", body="b")
+            second = dispatcher.submit("222222222222", title="t", body="b")
+            missing = dispatcher.submit("333333333333", title="t", body="b")
+            self.assertEqual(first.result(timeout=10), {"tokens": 2, "success": 2, "failure": 0})
+            self.assertEqual(second.result(timeout=10), {"tokens": 1, "success": 1, "failure": 0})
+            self.assertEqual(missing.result(timeout=10), {"tokens": 0, "success": 0, "failure": 0})
+        self.assertEqual(self.batches, [["t1", "t2", "t3"]])
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        FCMToken.objects.create(device_id="d1", token="t1", aadhaar_number="111111111111")
+        # Two caches stand in for the web and listener processes sharing the Django cache
+        self.web = TokenCache()
+        self.listener = TokenCache()
+
+    async def test_invalidation_reaches_other_processes(self):
+        self.assertEqual(await self.listener.get_many(["111111111111"]), {"111111111111": ["t1"]})
+        await FCMToken.objects.acreate(device_id="d2", token="t2", aadhaar_number="111111111111")
+        self.assertEqual(await self.listener.get_many(["111111111111"]), {"111111111111": ["t1"]})
+        await self.web.ainvalidate(["111111111111"])
+        tokens = await self.listener.get_many(["111111111111"])
+        self.assertEqual(sorted(tokens["111111111111"]), ["t1", "t2"])
+
+    async def test_invalidating_everything_reloads_every_entry(self):
+        await self.listener.get_many(["111111111111"])
+        await FCMToken.objects.all().adelete()
+        await self.web.ainvalidate()
+        self.assertEqual(await self.listener.get_many(["111111111111"]), {})
+
+    def test_registering_a_device_elsewhere_drops_its_old_aadhaar(self):
+        async_to_sync(self.listener.get_many)(["111111111111"])
+        response = self.client.post("/fcm/register/", {
+            "device_id": "d1", "token": "t1", "aadhaar_number": "222222222222",
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(async_to_sync(self.listener.get_many)(["111111111111", "222222222222"]),
+                         {"222222222222": ["t1"]})
+
+
+class TokenPruningTests(SimpleTestCase):
+    def test_dead_tokens_are_permanent(self):
+        self.assertTrue(is_permanent(messaging.UnregisteredError("gone")))
+        self.assertTrue(is_permanent(messaging.SenderIdMismatchError("other sender")))
+        self.assertTrue(is_permanent(exceptions.InvalidArgumentError(
+            "The registration token is not a valid FCM registration token")))
+
+    def test_payload_and_transient_errors_keep_the_token(self):
+        self.assertFalse(is_permanent(exceptions.InvalidArgumentError("Message payload exceeds 4096 bytes")))
+        self.assertFalse(is_permanent(exceptions.UnavailableError("try later")))
+        self.assertFalse(is_permanent(None))
+
+
+class TokenUpsertTests(TestCase):
+    def test_upsert_updates_by_device_and_keeps_last_duplicate(self):
+        FCMToken.objects.create(device_id="d1", token="old", aadhaar_number="111111111111")
+        FCMToken.objects.upsert([
+            FCMToken(device_id="d1", token="new", aadhaar_number="222222222222"),
+            FCMToken(device_id="d2", token="a", aadhaar_number="111111111111"),
+            FCMToken(device_id="d2", token="b", aadhaar_number="111111111111"),
+        ])
+        self.assertEqual(
+            sorted(FCMToken.objects.values_list("device_id", "token", "aadhaar_number")),
+            [("d1", "new", "222222222222"), ("d2", "b", "111111111111")],
+        )
+
+    def test_batch_endpoint_registers_every_device(self):
+        response = self.client.post("/fcm/register/batch/", [
+            {"device_id": "d1", "token": "a", "aadhaar_number": "111111111111"},
+            {"device_id": "d2", "token": "b", "aadhaar_number": "222222222222"},
+        ], content_type="application/json")
+        self.assertEqual((response.status_code, response.json()["count"]), (201, 2))
+        self.assertEqual(FCMToken.objects.count(), 2)
+
+
+class BroadcastSerializerTests(SimpleTestCase):
+    def test_rejects_oversized_payload(self):
+        serializer = BroadcastSerializer(data={
+            "aadhar_ids": ["123456789012"], "title": "t", "body": "b",
+            "data": {"x": "y" * FCM_MAX_PAYLOAD_BYTES},
+        })
+        self.assertFalse(serializer.is_valid())
+
+    def test_needs_exactly_one_audience(self):
+        serializer = BroadcastSerializer(data={"title": "t", "body": "b"})
+        self.assertFalse(serializer.is_valid())
+
+
+class BroadcastDispatchTests(TransactionTestCase):
+    def test_broadcast_pages_tokens_into_batches(self):
+        for i in range(7):
+            FCMToken.objects.create(device_id=f"d{i}", token=f"t{i}",
+                                    aadhaar_number="111111111111" if i < 5 else "222222222222")
+        FCMToken.objects.create(device_id="other", token="x", aadhaar_number="333333333333")
+        job = NotificationJob.objects.create(recipients=2)
+        dispatcher = dispatcher_module.NotificationDispatcher(batch_size=3)
+        batches = []
+
+        def send_each(messages):
+            batches.append(len(messages))
+            return FakeBatchResponse(messages)
+
+        with mock.patch.object(dispatcher_module.messaging, "send_each", side_effect=send_each):
+            future = dispatcher.submit_broadcast(["111111111111", "222222222222"], title="t", body="b", job_id=job.id)
+            self.assertEqual(future.result(timeout=10), {"tokens": 7, "success": 7, "failure": 0})
+        self.assertEqual(sorted(batches), [1, 3, 3])
+
+
+class NotificationViewTests(TestCase):
+    payload = {"aadhar_id": "123456789012", "title": "t", "body": "b", "imageId": "i", "imageType": "x"}
+
+    @mock.patch("fcm.views.queueNotification")
+    def test_send_returns_202_with_a_job_to_poll(self, queue):
+        response = self.client.post("/fcm/sendNotification/", self.payload, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(queue.call_args.kwargs["job_id"], job_id)
+        status = self.client.get(f"/fcm/notifications/{job_id}/").json()
+        self.assertEqual(status["status"], NotificationJob.STATUS_QUEUED)
+        self.assertEqual(self.client.get("/fcm/notifications/999999/").status_code, 404)
+
+    @mock.patch("fcm.views.queueNotification")
+    def test_send_still_accepts_form_posts(self, queue):
+        response = self.client.post("/fcm/sendNotification/", self.payload)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(queue.call_args.kwargs["aadharId"], "123456789012")
+
+    def test_invalid_json_is_rejected(self):
+        response = self.client.post("/fcm/sendNotification/", "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationJobRecoveryTests(TransactionTestCase):
+    def setUp(self):
+        # Tokens cached by earlier tests belong to rows that were flushed since
+        token_cache.invalidate()
+        FCMToken.objects.create(device_id="d1", token="t1", aadhaar_number="111111111111")
+        self.batches = []
+        patcher = mock.patch.object(dispatcher_module.messaging, "send_each", side_effect=self.send_each)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send_each(self, messages):
+        self.batches.append([message.token for message in messages])
+        return FakeBatchResponse(messages)
+
+    def make_job(self, status, age, **fields):
+        job = NotificationJob.objects.create(status=status, title="t", body="b", **fields)
+        NotificationJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(seconds=age))
+        return job
+
+    def wait_for_status(self, job, status):
+        for _ in range(100):
+            job.refresh_from_db()
+            if job.status == status:
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job.id} stayed {job.status}")
+
+    def test_abandoned_jobs_are_resent_and_interrupted_ones_fail(self):
+        single = self.make_job(NotificationJob.STATUS_QUEUED, 600, aadhaar_number="111111111111",
+                               data={"imageId": "i", "imageType": "x"})
+        broadcast = self.make_job(NotificationJob.STATUS_QUEUED, 600, aadhaar_numbers=["111111111111"])
+        fresh = self.make_job(NotificationJob.STATUS_QUEUED, 0, aadhaar_number="111111111111")
+        interrupted = self.make_job(NotificationJob.STATUS_SENDING, 3600, aadhaar_number="111111111111")
+        dispatcher_module.NotificationDispatcher(batch_wait=0.01).start()
+        self.assertEqual(self.wait_for_status(single, NotificationJob.STATUS_DONE).success, 1)
+        self.assertEqual(self.wait_for_status(broadcast, NotificationJob.STATUS_DONE).success, 1)
+        self.wait_for_status(interrupted, NotificationJob.STATUS_FAILED)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, NotificationJob.STATUS_QUEUED)
+
+    def test_a_job_claimed_elsewhere_is_not_sent_again(self):
+        job = self.make_job(NotificationJob.STATUS_SENDING, 0, aadhaar_number="111111111111")
+        future = dispatcher_module.NotificationDispatcher(batch_wait=0.01).submit("111111111111", job_id=job.id)
+        for _ in range(100):
+            if future.done():
+                break
+            time.sleep(0.05)
+        self.assertTrue(future.cancelled())
+        self.assertEqual(self.batches, [])
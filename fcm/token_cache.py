@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from .models import FCMToken
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+FCM_TOKEN_CACHE_SIZE = int(os.getenv('FCM_TOKEN_CACHE_SIZE', '50000'))
+FCM_TOKEN_CACHE_TTL = float(os.getenv('FCM_TOKEN_CACHE_TTL', '300'))
+# Generation keys must outlive local entries, or an expired key could match an old entry again
+FCM_TOKEN_GENERATION_TTL = max(int(FCM_TOKEN_CACHE_TTL) * 2, 86400)
+GENERATION_KEY = "fcm_tokens:generation"
+
+
+def _generation_key(aadhaar):
+    return f"{GENERATION_KEY}:{aadhaar}"
+
+
+def _fresh_generation():
+    # Never equal to a value the key held before it expired
+    return time.time_ns()
+
+
+class TokenCache:
+    """Bounded TTL/LRU cache of tokens keyed by Aadhaar number.
+
+    Misses for a whole batch are loaded with one indexed ``aadhaar_number__in``
+    query. Aadhaar numbers without devices are not cached, so a fresh
+    registration is picked up on the next send. Each entry remembers the
+    shared generation of its Aadhaar number (and of the whole cache) in the
+    Django cache; a write in any process bumps it, and every other process
+    reloads the entry on its next lookup.
+    """
+
+    def __init__(self, maxsize=FCM_TOKEN_CACHE_SIZE, ttl=FCM_TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # aadhaar -> (tokens, expires at, generation)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, aadhaar, generation):
+        entry = self._entries.get(aadhaar)
+        if entry is not None and entry[1] > time.monotonic() and entry[2] == generation:
+            self._entries.move_to_end(aadhaar)
+            self.hits += 1
+            return entry[0]
+        self._entries.pop(aadhaar, None)
+        self.misses += 1
+        return None
+
+    def _store(self, aadhaar, tokens, generation):
+        self._entries.pop(aadhaar, None)
+        self._entries[aadhaar] = (tokens, time.monotonic() + self.ttl, generation)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, aadhaar_numbers):
+        """Return {aadhaar: [token, ...]} for every Aadhaar number that has devices"""
+        aadhaar_numbers = {str(a) for a in aadhaar_numbers}
+        # Read before the database so a write racing the load only causes another reload
+        shared = await cache.aget_many([GENERATION_KEY] + [_generation_key(a) for a in aadhaar_numbers])
+        generations = {
+            aadhaar: (shared.get(GENERATION_KEY, 0), shared.get(_generation_key(aadhaar), 0))
+            for aadhaar in aadhaar_numbers
+        }
+        found = {}
+        with self._lock:
+            missing = []
+            for aadhaar in aadhaar_numbers:
+                tokens = self._lookup(aadhaar, generations[aadhaar])
+                if tokens is None:
+                    missing.append(aadhaar)
+                else:
+                    found[aadhaar] = tokens
+        if missing:
+            loaded = {}
+            async for aadhaar, token in FCMToken.objects.filter(
+                aadhaar_number__in=missing
+            ).values_list("aadhaar_number", "token"):
+                loaded.setdefault(aadhaar, []).append(token)
+            with self._lock:
+                for aadhaar, tokens in loaded.items():
+                    self._store(aadhaar, tokens, generations[aadhaar])
+            found.update(loaded)
+        return found
+
+    def _forget(self, aadhaar_numbers):
+        """Drop local entries and return the shared generation keys to bump"""
+        with self._lock:
+            if aadhaar_numbers is None:
+                self._entries.clear()
+                return [GENERATION_KEY]
+            aadhaar_numbers = {str(a) for a in aadhaar_numbers}
+            for aadhaar in aadhaar_numbers:
+                self._entries.pop(aadhaar, None)
+        return [_generation_key(a) for a in aadhaar_numbers]
+
+    def invalidate(self, aadhaar_numbers=None):
+        """Make every process reload these Aadhaar numbers (everything if None is given)"""
+        for key in self._forget(aadhaar_numbers):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _fresh_generation(), FCM_TOKEN_GENERATION_TTL)
+
+    async def ainvalidate(self, aadhaar_numbers=None):
+        """Async variant of invalidate() for callers on an event loop"""
+        for key in self._forget(aadhaar_numbers):
+            try:
+                await cache.aincr(key)
+            except ValueError:
+                await cache.aset(key, _fresh_generation(), FCM_TOKEN_GENERATION_TTL)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+token_cache = TokenCache()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from .models import FCMToken
+from .token_cache import token_cache
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# Tokens not refreshed by the app for this long are treated as abandoned devices
+FCM_TOKEN_MAX_AGE_DAYS = int(os.getenv('FCM_TOKEN_MAX_AGE_DAYS', '60'))
+FCM_TOKEN_SWEEP_INTERVAL = float(os.getenv('FCM_TOKEN_SWEEP_INTERVAL', '3600'))
+
+# The token itself is dead or belongs to another sender; resending can never succeed
+PERMANENT_ERRORS = (
+    messaging.UnregisteredError,
+    messaging.SenderIdMismatchError,
+)
+
+
+def is_permanent(error):
+    """True when an FCM send error means the token should be deleted rather than retried"""
+    if isinstance(error, PERMANENT_ERRORS):
+        return True
+    # INVALID_ARGUMENT also covers bad payloads (e.g. oversized data), which say nothing about the token
+    return isinstance(error, exceptions.InvalidArgumentError) and "registration token" in str(error).lower()
+
+
+class TokenPruner:
+    """Deletes dead FCM tokens in bulk and periodically expires stale ones"""
+
+    def __init__(self, max_age_days=FCM_TOKEN_MAX_AGE_DAYS, sweep_interval=FCM_TOKEN_SWEEP_INTERVAL):
+        self.max_age = timedelta(days=max_age_days)
+        self.sweep_interval = sweep_interval
+
+    async def prune(self, dead_tokens):
+        """Delete tokens FCM rejected permanently, given as {token: aadhaar}, in one query"""
+        if not dead_tokens:
+            return 0
+        deleted, _ = await FCMToken.objects.filter(token__in=list(dead_tokens)).adelete()
+        await token_cache.ainvalidate(set(dead_tokens.values()))
+        logger.info(f"Removed {deleted} unregistered tokens from database")
+        return deleted
+
+    async def sweep(self):
+        """Delete tokens whose device has not re-registered within max_age"""
+        cutoff = timezone.now() - self.max_age
+        deleted, _ = await FCMToken.objects.filter(updated_at__lt=cutoff).adelete()
+        if deleted:
+            await token_cache.ainvalidate()
+            logger.info(f"Expired {deleted} tokens not refreshed since {cutoff:%Y-%m-%d}")
+        return deleted
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"FCM token sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+
+token_pruner = TokenPruner()
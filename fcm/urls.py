@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path("register/", views.RegisterFCMToken.as_view(), name="review-image"),
-    path("sendNotification/",view=views.sendNotification,name="send-notification")
+    path("register/batch/", views.RegisterFCMTokenBatch.as_view(), name="register-batch"),
+    path("sendNotification/",view=views.sendNotification,name="send-notification"),
+    path("broadcast/", view=views.broadcastNotification, name="broadcast-notification"),
+    path("notifications/<int:job_id>/", view=views.notificationStatus, name="notification-status"),
 ]
\ No newline at end of file
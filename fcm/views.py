@@ -1,17 +1,29 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import FCMToken
 from .serializer import FCMTokenSerializer
+from .token_cache import token_cache
+import json
 import logging
-from rest_framework.decorators import api_view
-from .serializer import NotificationSerializer
-from .send_notification import sendNotifications
-from asgiref.sync import async_to_sync
+import os
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from .models import FCMToken, NotificationJob, NotificationSegment
+from .serializer import NotificationSerializer, NotificationJobSerializer, BroadcastSerializer
+from .dispatcher import dispatcher
+from .send_notification import queueNotification
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+FCM_REGISTER_MAX_BATCH = int(os.getenv('FCM_REGISTER_MAX_BATCH', '500'))
+
+def _aadhaar_numbers_of(device_ids):
+    """Aadhaar numbers the given devices are registered to right now"""
+    return set(FCMToken.objects.filter(device_id__in=list(device_ids)).values_list("aadhaar_number", flat=True))
+
 class RegisterFCMToken(APIView):
     def post(self, request):
         serializer = FCMTokenSerializer(data=request.data)
@@ -25,40 +37,108 @@ class RegisterFCMToken(APIView):
             logger.info(f"  Token: {token}")
             logger.info(f"  Aadhaar Number: {aadhaar_number}")
             
-            # Check if device_id already exists
-            existing_token = FCMToken.objects.filter(device_id=device_id).first()
-            
-            if existing_token:
-                logger.info(f"  Updating existing token for device_id: {device_id}")
-                message = "Token updated successfully."
-            else:
-                logger.info(f"  Creating new token for device_id: {device_id}")
-                message = "Token registered successfully."
-            
-            # Let the serializer handle the create/update logic
+            # A device moving to another Aadhaar must stop receiving its pushes, so note the old one first
+            previous = _aadhaar_numbers_of([device_id])
+            # One upsert statement covers both new and returning devices
             fcm_token = serializer.save()
+            token_cache.invalidate(previous | {aadhaar_number})
             logger.info(f"  Operation completed successfully. Updated at: {fcm_token.updated_at}")
 
-            return Response({"message": message}, status=status.HTTP_201_CREATED)
+            return Response({"message": "Token registered successfully."}, status=status.HTTP_201_CREATED)
         
         logger.error(f"Invalid serializer data: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(["POST"])
-def sendNotification(request):
-    serializer = NotificationSerializer(data=request.data)
+class RegisterFCMTokenBatch(APIView):
+    """Register many devices at once, e.g. a queue of registrations flushed after an app release"""
+
+    def post(self, request):
+        serializer = FCMTokenSerializer(data=request.data, many=True, max_length=FCM_REGISTER_MAX_BATCH)
+        if serializer.is_valid():
+            previous = _aadhaar_numbers_of(record['device_id'] for record in serializer.validated_data)
+            fcm_tokens = serializer.save()
+            token_cache.invalidate(previous | {record['aadhaar_number'] for record in serializer.validated_data})
+            logger.info(f"Registered {len(fcm_tokens)} FCM tokens in one batch")
+
+            return Response({"message": "Tokens registered successfully.", "count": len(fcm_tokens)}, status=status.HTTP_201_CREATED)
+
+        logger.error(f"Invalid batch registration data: {serializer.errors}")
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+def _request_data(request):
+    """Parse JSON bodies; form-encoded and multipart posts come through request.POST, as DRF accepted them"""
+    if request.content_type != "application/json":
+        return request.POST
+    try:
+        return json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+
+# DRF views are sync only, so these are plain Django async views with DRF serializers for validation.
+# The app authenticates with its own payloads, not sessions, hence csrf_exempt like the DRF views before.
+@csrf_exempt
+@require_POST
+async def sendNotification(request):
+    serializer = NotificationSerializer(data=_request_data(request))
     if serializer.is_valid():
-        # don’t save, just return
         aadhar_id = serializer.validated_data["aadhar_id"]
         title = serializer.validated_data["title"]
         body = serializer.validated_data["body"]
         imageId = serializer.validated_data["imageId"]
         imageType = serializer.validated_data["imageType"]
-        async_to_sync(sendNotifications)(aadharId=aadhar_id,title = title, body = body,imageId = imageId,imageType = imageType)
+        job = await NotificationJob.objects.acreate(
+            aadhaar_number=aadhar_id, title=title, body=body,
+            data={"imageId": imageId, "imageType": imageType},
+        )
+        # The dispatcher sends in the background and fills in the job's counts; the worker is freed now
+        queueNotification(aadharId=aadhar_id,title = title, body = body,imageId = imageId,imageType = imageType, job_id=job.id)
 
-        return Response({
-            "message": "Aadhar received",
-            "aadhar_id": serializer.validated_data["aadhar_id"]
-        }, status=status.HTTP_200_OK)
+        return JsonResponse({
+            "message": "Notification queued",
+            "aadhar_id": aadhar_id,
+            "job_id": job.id,
+            "status_url": request.build_absolute_uri(reverse("notification-status", args=[job.id])),
+        }, status=202)
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return JsonResponse(serializer.errors, status=400)
+
+@csrf_exempt
+@require_POST
+async def broadcastNotification(request):
+    serializer = BroadcastSerializer(data=_request_data(request))
+    if serializer.is_valid():
+        segment_name = serializer.validated_data.get("segment", "")
+        if segment_name:
+            segment = await NotificationSegment.objects.filter(name=segment_name).afirst()
+            if segment is None:
+                return JsonResponse({"error": f"Segment {segment_name} not found"}, status=404)
+            aadhar_ids = segment.aadhaar_numbers
+        else:
+            aadhar_ids = serializer.validated_data["aadhar_ids"]
+        title = serializer.validated_data["title"]
+        body = serializer.validated_data["body"]
+        data = serializer.validated_data.get("data", {})
+        aadhaar_numbers = sorted({str(aadhaar) for aadhaar in aadhar_ids})
+        job = await NotificationJob.objects.acreate(
+            segment=segment_name, aadhaar_numbers=aadhaar_numbers, recipients=len(aadhaar_numbers),
+            title=title, body=body, data=data,
+        )
+        # Tokens for every recipient come from one query and are streamed into FCM batches
+        dispatcher.submit_broadcast(aadhar_ids, title=title, body=body, data=data, job_id=job.id)
+        logger.info(f"Queued broadcast job {job.id} for {job.recipients} Aadhaar numbers")
+
+        return JsonResponse({
+            "message": "Broadcast queued",
+            "recipients": job.recipients,
+            "job_id": job.id,
+            "status_url": request.build_absolute_uri(reverse("notification-status", args=[job.id])),
+        }, status=202)
+
+    return JsonResponse(serializer.errors, status=400)
+
+@require_GET
+async def notificationStatus(request, job_id):
+    job = await NotificationJob.objects.filter(id=job_id).afirst()
+    if job is None:
+        return JsonResponse({"error": "Notification job not found"}, status=404)
+    return JsonResponse(NotificationJobSerializer(job).data)
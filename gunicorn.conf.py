@@ -0,0 +1,17 @@
+# Gunicorn configuration: serve the ASGI app with uvicorn workers so async views
+# can hold many slow RPC and FCM calls per process.
+#
+#   gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = "CropChain.asgi:application"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+# Persistent DB connections are per request context under ASGI and are not reused, so close them
+os.environ.setdefault('CONN_MAX_AGE', '0')